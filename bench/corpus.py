@@ -0,0 +1,82 @@
+import io
+import os
+import random
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image
+
+IMAGE_SIZE = (320, 240)
+THUMB_SIZE = (120, 90)
+
+
+class SyntheticCorpus:
+    """Deterministic image corpus with controlled exact- and near-duplicate rates.
+
+    Item i is either a new unique photo, a byte-identical copy of an earlier
+    one, or a near duplicate of one (resized, lightly cropped and re-encoded).
+    Images are rendered on demand, so a 100k corpus costs no memory until used.
+    """
+
+    def __init__(self, size, duplicate_rate=0.1, near_duplicate_rate=0.1, seed=0, image_size=IMAGE_SIZE):
+        self.size = size
+        self.seed = seed
+        self.image_size = image_size
+        rng = random.Random(seed)
+        self.items = []
+        unique = 0
+        for _ in range(size):
+            roll = rng.random()
+            if unique and roll < duplicate_rate:
+                self.items.append(('duplicate', rng.randrange(unique)))
+            elif unique and roll < duplicate_rate + near_duplicate_rate:
+                self.items.append(('near', rng.randrange(unique)))
+            else:
+                self.items.append(('unique', unique))
+                unique += 1
+        self.unique_count = unique
+
+    def __len__(self):
+        return self.size
+
+    def base_image(self, base):
+        # Random 8x8 colour blocks upscaled: every base gets an unrelated average hash
+        rng = np.random.default_rng((self.seed, base))
+        blocks = rng.integers(0, 256, size=(8, 8, 3), dtype=np.uint8)
+        img = Image.fromarray(blocks).resize(self.image_size, Image.BILINEAR)
+        noise = rng.integers(-12, 12, size=(self.image_size[1], self.image_size[0], 3))
+        return Image.fromarray(np.clip(np.asarray(img, dtype=np.int16) + noise, 0, 255).astype(np.uint8))
+
+    @lru_cache(maxsize=4096)
+    def base_bytes(self, base):
+        buffer = io.BytesIO()
+        self.base_image(base).save(buffer, 'JPEG', quality=90)
+        return buffer.getvalue()
+
+    def image_bytes(self, i):
+        kind, base = self.items[i]
+        if kind != 'near':
+            return self.base_bytes(base)
+        img = self.base_image(base)
+        width, height = img.size
+        img = img.crop((4, 3, width - 4, height - 3)).resize((int(width * 0.9), int(height * 0.9)))
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=70)
+        return buffer.getvalue()
+
+    def thumbnail_bytes(self, i):
+        img = Image.open(io.BytesIO(self.image_bytes(i)))
+        img.thumbnail(THUMB_SIZE)
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=75)
+        return buffer.getvalue()
+
+    def write(self, directory, prefix='img'):
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for i in range(self.size):
+            path = os.path.join(directory, f"{prefix}_{i:06d}.jpg")
+            with open(path, 'wb') as f:
+                f.write(self.image_bytes(i))
+            paths.append(path)
+        return paths
@@ -0,0 +1,149 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+PAGE_SIZE = 100
+VQD = "4-000000000000000000000000000000000000"
+
+RESULTS_PAGE = """<!DOCTYPE html>
+<html><head><title>{query} at DuckDuckGo</title></head>
+<body>
+<script>vqd="{vqd}";</script>
+<div class="tile-wrap">{tiles}</div>
+<input type="button" value="Show more results" onclick="showMore()">
+<div class="detail" style="display:none">
+  <button class="module__close" onclick="closeDetail()">x</button>
+</div>
+<script>
+var next = {next};
+function tile(result) {{
+  var img = document.createElement('img');
+  img.className = 'tile--img__img';
+  img.src = result.thumbnail;
+  img.dataset.id = result.id;
+  img.onclick = function () {{ openDetail(result.image); }};
+  document.querySelector('.tile-wrap').appendChild(img);
+}}
+function openDetail(src) {{
+  var detail = document.querySelector('.detail');
+  var old = detail.querySelector('.detail__media__img-highres');
+  if (old) old.remove();
+  var full = document.createElement('img');
+  full.className = 'detail__media__img-highres';
+  full.src = src;
+  detail.appendChild(full);
+  detail.style.display = 'block';
+}}
+function closeDetail() {{
+  var detail = document.querySelector('.detail');
+  var old = detail.querySelector('.detail__media__img-highres');
+  if (old) old.remove();
+  detail.style.display = 'none';
+}}
+document.querySelectorAll('img.tile--img__img').forEach(function (img) {{
+  img.onclick = function () {{ openDetail(img.dataset.full); }};
+}});
+function showMore() {{
+  if (!next) return;
+  fetch('/' + next + '&vqd={vqd}').then(function (r) {{ return r.json(); }}).then(function (data) {{
+    data.results.forEach(tile);
+    next = data.next;
+  }});
+}}
+</script>
+</body></html>
+"""
+
+
+class FakeSearchServer:
+    """Local stand-in for DuckDuckGo image search and the image hosts behind it.
+
+    Serves the results page (img.tile--img__img thumbnails that open a
+    .detail__media__img-highres view), the i.js JSON API, /img/<n>.jpg full
+    images and /thumb/<n>.jpg thumbnails, all drawn from a SyntheticCorpus.
+    """
+
+    def __init__(self, corpus, host='127.0.0.1', port=0, page_size=PAGE_SIZE):
+        self.corpus = corpus
+        self.page_size = page_size
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server.handle(self)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = None
+
+    def result(self, i):
+        return {
+            'id': i,
+            'image': f"{self.base_url}/img/{i}.jpg",
+            'thumbnail': f"{self.base_url}/thumb/{i}.jpg",
+            'width': self.corpus.image_size[0],
+            'height': self.corpus.image_size[1],
+            'title': f"image {i}"
+        }
+
+    def page(self, start):
+        end = min(start + self.page_size, len(self.corpus))
+        data = {'results': [self.result(i) for i in range(start, end)]}
+        if end < len(self.corpus):
+            data['next'] = f"i.js?q=q&o=json&s={end}"
+        return data
+
+    def handle(self, request):
+        url = urlparse(request.path)
+        query = parse_qs(url.query)
+        try:
+            if url.path == '/':
+                first = self.page(0)
+                tiles = ''.join(
+                    f'<img class="tile--img__img" src="{r["thumbnail"]}" data-id="{r["id"]}" data-full="{r["image"]}">'
+                    for r in first['results']
+                )
+                body = RESULTS_PAGE.format(
+                    query=query.get('q', [''])[0], vqd=VQD, tiles=tiles, next=json.dumps(first.get('next'))
+                ).encode()
+                self.send(request, 200, 'text/html; charset=utf-8', body)
+            elif url.path == '/i.js':
+                if query.get('vqd', [''])[0] != VQD:
+                    self.send(request, 403, 'text/plain', b'bad vqd')
+                    return
+                start = int(query.get('s', ['0'])[0])
+                self.send(request, 200, 'application/json', json.dumps(self.page(start)).encode())
+            elif url.path.startswith(('/img/', '/thumb/')):
+                i = int(url.path.rsplit('/', 1)[1].split('.')[0])
+                if not 0 <= i < len(self.corpus):
+                    self.send(request, 404, 'text/plain', b'not found')
+                    return
+                data = self.corpus.image_bytes(i) if url.path.startswith('/img/') else self.corpus.thumbnail_bytes(i)
+                self.send(request, 200, 'image/jpeg', data)
+            else:
+                self.send(request, 404, 'text/plain', b'not found')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def send(self, request, status, content_type, body):
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
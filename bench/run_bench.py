@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'libs'), os.path.dirname(os.path.abspath(__file__))]
+
+from corpus import SyntheticCorpus
+from fake_server import FakeSearchServer
+
+RESULTS_DIR = os.path.join(ROOT, 'bench', 'results')
+BENCHMARKS = ('fingerprint', 'clean_duplicates', 'scrape')
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def peak_rss_mb():
+    # ru_maxrss is KB on Linux; children covers process-pool workers
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def bench_fingerprint(corpus, workdir):
+    from fingerprint import fingerprint_batch, load_hash_pixels
+
+    paths = corpus.write(os.path.join(workdir, 'images'))
+    start = time.perf_counter()
+    fingerprint_batch(paths)
+    elapsed = time.perf_counter() - start
+
+    latencies = []
+    for path in paths[:500]:
+        t = time.perf_counter()
+        load_hash_pixels(path)
+        latencies.append(time.perf_counter() - t)
+    return {'seconds': elapsed, 'images': len(paths), 'latencies': latencies}
+
+
+def bench_clean_duplicates(corpus, workdir):
+    import main
+
+    save_path = os.path.join(workdir, 'raw')
+    corpus.write(os.path.join(save_path, 'bench'))
+    start = time.perf_counter()
+    unique = main.clean_duplicates(save_path, 'bench')
+    cold = time.perf_counter() - start
+
+    latencies = []
+    for _ in range(5):
+        t = time.perf_counter()
+        main.clean_duplicates(save_path, 'bench')
+        latencies.append(time.perf_counter() - t)
+    return {
+        'seconds': cold,
+        'images': len(corpus),
+        'latencies': latencies,
+        'warm_seconds': percentile(latencies, 0.5),
+        'unique_kept': len(unique),
+        'unique_expected': corpus.unique_count
+    }
+
+
+def bench_scrape(corpus, workdir):
+    import main
+    from metrics import METRICS
+
+    server = FakeSearchServer(corpus).start()
+    main.SEARCH_BASE_URL = server.base_url
+    main.API_MAX_PAGES = None
+    try:
+        stats = {}
+        start = time.perf_counter()
+        saved = main.scrape_images('bench cow', len(corpus), os.path.join(workdir, 'raw'), 'bench', backend='api', stats=stats)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.stop()
+    download = METRICS.histograms.get('download')
+    # The rate is over urls the crawler actually harvested, which can fall short of the corpus
+    return {
+        'seconds': elapsed,
+        'images': stats.get('processed', 0),
+        'corpus_size': len(corpus),
+        'latencies': [],
+        'p50_override': download.quantile(0.5) if download else None,
+        'p99_override': download.quantile(0.99) if download else None,
+        'unique_kept': saved,
+        'unique_expected': corpus.unique_count
+    }
+
+
+def run_one(name, size, duplicate_rate, near_duplicate_rate, seed):
+    # Runs in a fresh process so peak RSS belongs to this benchmark alone
+    import io
+    import contextlib
+
+    corpus = SyntheticCorpus(size, duplicate_rate, near_duplicate_rate, seed)
+    workdir = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            raw = globals()[f"bench_{name}"](corpus, workdir)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    latencies = raw.pop('latencies')
+    p50 = raw.pop('p50_override', None) or percentile(latencies, 0.5)
+    p99 = raw.pop('p99_override', None) or percentile(latencies, 0.99)
+    return dict(
+        raw,
+        benchmark=name,
+        size=size,
+        images_per_second=raw['images'] / raw['seconds'] if raw['seconds'] else None,
+        p50_latency_seconds=p50,
+        p99_latency_seconds=p99,
+        peak_rss_mb=peak_rss_mb()
+    )
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = {(r['benchmark'], r['size']): r for r in json.load(f)['results']}
+    for result in results:
+        old = baseline.get((result['benchmark'], result['size']))
+        if not old or not old.get('images_per_second') or not result.get('images_per_second'):
+            continue
+        ratio = result['images_per_second'] / old['images_per_second']
+        flag = "  <-- regression" if ratio < 0.9 else ""
+        print(f"{result['benchmark']:>16} {result['size']:>7}: {ratio:.2f}x baseline{flag}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline scraper benchmarks against a local fake search server")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument('--duplicate-rate', type=float, default=0.1)
+    parser.add_argument('--near-duplicate-rate', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', default=None, help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        for name in args.benchmarks:
+            print(f"Running {name} at {size} images...")
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as executor:
+                result = executor.submit(run_one, name, size, args.duplicate_rate, args.near_duplicate_rate, args.seed).result()
+            results.append(result)
+            print(f"  {result['images_per_second']:.1f} images/s, p50 {result['p50_latency_seconds']}, "
+                  f"p99 {result['p99_latency_seconds']}, peak RSS {result['peak_rss_mb']:.0f} MB")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': sys.version.split()[0],
+            'duplicate_rate': args.duplicate_rate,
+            'near_duplicate_rate': args.near_duplicate_rate,
+            'seed': args.seed,
+            'results': results
+        }, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from fingerprint import load_hash_pixels, average_hashes, hash_to_hex
+from hash_index import IMAGE_EXTENSIONS
+from near_duplicates import NearDuplicateIndex, DEFAULT_THRESHOLD
+from shards import iter_dataset, list_shard_classes
+
+CSV_FIELDS = ['class', 'file', 'bytes', 'format', 'mode', 'width', 'height', 'md5', 'ahash', 'error']
+
+
+def scan_dataset(root, extensions=IMAGE_EXTENSIONS):
+    files = []
+    with os.scandir(root) as classes:
+        for class_entry in sorted(classes, key=lambda e: e.name):
+            if class_entry.name.startswith('.') or not class_entry.is_dir():
+                continue
+            with os.scandir(class_entry.path) as entries:
+                for entry in sorted(entries, key=lambda e: e.name):
+                    if entry.name.lower().endswith(extensions) and entry.is_file():
+                        files.append((class_entry.name, entry.path))
+    return files
+
+
+def audit_file(class_name, file_path):
+    # One read per file: md5, header fields and the perceptual hash all come from these bytes
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        record = dict.fromkeys(CSV_FIELDS)
+        record.update({'class': class_name, 'file': os.path.basename(file_path), 'error': str(e)[:200]})
+        return record, None
+    return audit_bytes(class_name, os.path.basename(file_path), data)
+
+
+def audit_bytes(class_name, name, data):
+    record = dict.fromkeys(CSV_FIELDS)
+    record['class'] = class_name
+    record['file'] = name
+    pixels = None
+    try:
+        record['bytes'] = len(data)
+        record['md5'] = hashlib.md5(data).hexdigest()
+        with Image.open(io.BytesIO(data)) as img:
+            record['format'] = img.format
+            record['mode'] = img.mode
+            record['width'], record['height'] = img.size
+        pixels = load_hash_pixels(data)
+    except Exception as e:
+        record['error'] = str(e)[:200]
+    return record, pixels
+
+
+def _audit_chunk(items):
+    # items are (class, path) from a folder scan or (class, name, bytes) from packed shards
+    results = [audit_file(*item) if len(item) == 2 else audit_bytes(*item) for item in items]
+    decoded = [i for i, (_, pixels) in enumerate(results) if pixels is not None]
+    if decoded:
+        hashes = average_hashes(np.stack([results[i][1] for i in decoded]))
+        for i, img_hash in zip(decoded, hashes):
+            results[i][0]['ahash'] = hash_to_hex(img_hash)
+    return [record for record, _ in results]
+
+
+def _shard_chunks(shards_dir, chunk_size):
+    class_names = list_shard_classes(shards_dir)
+    chunk = []
+    for item in iter_dataset(shards_dir, class_names):
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def audit_dataset(root, workers=None, threshold=DEFAULT_THRESHOLD, chunk_size=64, shards_dir=None):
+    if shards_dir:
+        # Packed shards are read sequentially here and only the decoding is spread over the pool
+        chunks = _shard_chunks(shards_dir, chunk_size)
+    else:
+        files = scan_dataset(root)
+        chunks = [files[i:i + chunk_size] for i in range(0, len(files), chunk_size)]
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_records in executor.map(_audit_chunk, chunks):
+            records.extend(chunk_records)
+
+    classes = {}
+    by_md5 = {}
+    near_indexes = {}
+    for record in records:
+        summary = classes.setdefault(record['class'], {
+            'count': 0, 'errors': 0, 'non_rgb': 0, 'modes': {}, 'formats': {},
+            'min_width': None, 'min_height': None, 'max_width': None, 'max_height': None,
+            'exact_duplicates': 0, 'perceptual_duplicates': 0
+        })
+        summary['count'] += 1
+        if record['error']:
+            summary['errors'] += 1
+            continue
+        summary['modes'][record['mode']] = summary['modes'].get(record['mode'], 0) + 1
+        summary['formats'][record['format']] = summary['formats'].get(record['format'], 0) + 1
+        if record['mode'] != 'RGB':
+            summary['non_rgb'] += 1
+        for key, value, pick in (('min_width', record['width'], min), ('max_width', record['width'], max),
+                                 ('min_height', record['height'], min), ('max_height', record['height'], max)):
+            summary[key] = value if summary[key] is None else pick(summary[key], value)
+
+        path = f"{record['class']}/{record['file']}"
+        by_md5.setdefault(record['md5'], []).append(path)
+
+        near = near_indexes.setdefault(record['class'], NearDuplicateIndex(threshold))
+        match = near.find(record['ahash'])
+        if match:
+            summary['perceptual_duplicates'] += 1
+            record['duplicate_of'] = match[0]
+        else:
+            near.add(record['ahash'], path)
+
+    exact_groups = [paths for paths in by_md5.values() if len(paths) > 1]
+    for paths in exact_groups:
+        for path in paths[1:]:
+            classes[path.split('/', 1)[0]]['exact_duplicates'] += 1
+
+    report = {
+        'root': shards_dir or root,
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'total_images': len(records),
+        'hamming_threshold': threshold,
+        'classes': classes,
+        'exact_duplicate_groups': exact_groups,
+        'perceptual_duplicates': [
+            {'file': f"{r['class']}/{r['file']}", 'duplicate_of': r['duplicate_of']}
+            for r in records if r.get('duplicate_of')
+        ]
+    }
+    return report, records
+
+
+def write_report(report, records, output):
+    with open(f"{output}.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(f"{output}.csv", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Audit every class folder in one pass")
+    parser.add_argument('--root', default='./dataset/raw')
+    parser.add_argument('--output', default='./dataset/audit_report')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--threshold', type=int, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--shards', default=None, help="audit packed shards in this folder instead of --root")
+    args = parser.parse_args()
+
+    start = time.time()
+    report, records = audit_dataset(args.root, workers=args.workers, threshold=args.threshold, shards_dir=args.shards)
+    write_report(report, records, args.output)
+
+    for class_name, summary in report['classes'].items():
+        print(f"{class_name}: {summary['count']} images, {summary['non_rgb']} non-RGB, "
+              f"{summary['exact_duplicates']} exact duplicates, {summary['perceptual_duplicates']} perceptual duplicates, "
+              f"{summary['errors']} unreadable")
+    print(f"\nAudited {report['total_images']} images in {time.time() - start:.1f}s")
+    print(f"Report written to {args.output}.json and {args.output}.csv")
@@ -0,0 +1,290 @@
+import argparse
+import csv
+import json
+import os
+import queue
+import shutil
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from fingerprint import hex_hashes
+from hash_index import HashIndex, IMAGE_EXTENSIONS, index_path, list_classes
+from shards import ShardReader, list_shard_classes, read_member
+from tensor_cache import preprocess, INPUT_SHAPE
+
+MODEL_PATH = './models/Resnet50/ResNet50_model.h5'
+BATCH_SIZE = 128
+PREFETCH_BATCHES = 4
+# Shard members are hashed this many at a time, so only one chunk of image bytes is in memory
+SHARD_HASH_CHUNK = 2048
+MIN_CONFIDENCE = 0.6
+QUARANTINE_DIR = '.quarantine'
+# keras.applications.resnet50.preprocess_input ("caffe" mode): RGB -> BGR, ImageNet channel means removed
+CAFFE_MEAN = np.array([103.939, 116.779, 123.68], dtype=np.float32)
+CSV_FIELDS = ['class', 'file', 'hash', 'predicted', 'confidence', 'label_probability', 'flagged', 'cached', 'error']
+
+
+def load_model(path=MODEL_PATH):
+    # TensorFlow is only imported when the real model is needed; callers may pass any object with predict()
+    from tensorflow import keras
+    return keras.models.load_model(path, compile=False)
+
+
+def model_key(path):
+    st = os.stat(path)
+    return f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def resnet50_preprocess(images):
+    x = images[..., ::-1].astype(np.float32)
+    x -= CAFFE_MEAN
+    return x
+
+
+class PredictionCache:
+    """Class probabilities per (model, image hash), so re-runs only score images not seen before."""
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS predictions ("
+            "model TEXT, hash TEXT, probabilities BLOB, PRIMARY KEY (model, hash))"
+        )
+        self.conn.commit()
+
+    def get_many(self, model, hashes):
+        found = {}
+        hashes = list(hashes)
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT hash, probabilities FROM predictions WHERE model = ? AND hash IN ({','.join('?' * len(chunk))})",
+                [model] + chunk
+            )
+            for img_hash, blob in rows:
+                found[img_hash] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def put_many(self, model, rows):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+            [(model, img_hash, np.asarray(probs, dtype=np.float32).tobytes()) for img_hash, probs in rows]
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def folder_items(save_path, class_name):
+    # Hashes come from the class hash index; only files added since its last sync get fingerprinted
+    images_dir = os.path.join(save_path, class_name)
+    index = HashIndex(index_path(save_path, class_name))
+    index.sync(images_dir, hex_hashes, IMAGE_EXTENSIONS)
+    items = [
+        {'class': class_name, 'file': name, 'hash': img_hash, 'source': os.path.join(images_dir, name)}
+        for name, img_hash in index.items()
+    ]
+    index.close()
+    return items
+
+
+def shard_items(shards_dir, class_names, chunk_size=SHARD_HASH_CHUNK):
+    # An item's source is its (shard path, offset, size); bytes are read a chunk at a time to hash
+    # and read again by the decode threads, so they are never all held at once
+    items = []
+    for class_name in class_names:
+        reader = ShardReader(shards_dir, class_name)
+        for start in range(0, len(reader), chunk_size):
+            rows = range(start, min(start + chunk_size, len(reader)))
+            for i, img_hash in zip(rows, hex_hashes([reader.read(i) for i in rows])):
+                entry = reader.entries[i]
+                items.append({
+                    'class': class_name, 'file': entry['name'], 'hash': img_hash,
+                    'source': (os.path.join(shards_dir, entry['shard']), entry['offset'], entry['size'])
+                })
+        reader.close()
+    return items
+
+
+def _decode(source):
+    try:
+        if isinstance(source, tuple):
+            source = read_member(*source)
+        return preprocess(source), None
+    except Exception as e:
+        return None, str(e)[:200]
+
+
+def prefetch_batches(items, batch_size=BATCH_SIZE, threads=None, prefetch=PREFETCH_BATCHES):
+    # Decoding runs on a thread pool (PIL releases the GIL) and stays up to `prefetch` batches ahead
+    batches = queue.Queue(maxsize=prefetch)
+
+    def produce():
+        with ThreadPoolExecutor(max_workers=threads or os.cpu_count()) as executor:
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                batches.put((batch, list(executor.map(_decode, [item['source'] for item in batch]))))
+        batches.put(None)
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        entry = batches.get()
+        if entry is None:
+            return
+        yield entry
+
+
+def predict_batch(model, x):
+    predict_on_batch = getattr(model, 'predict_on_batch', None)
+    probs = predict_on_batch(x) if predict_on_batch else model.predict(x)
+    return np.asarray(probs, dtype=np.float32)
+
+
+def classify_items(items, model, labels, cache=None, model_id='model', batch_size=BATCH_SIZE,
+                   threads=None, prepare=resnet50_preprocess, min_confidence=MIN_CONFIDENCE):
+    # labels lists the model's output classes in order; an image is flagged when the top class is not
+    # its folder or the model is not confident enough in it
+    cached = cache.get_many(model_id, {item['hash'] for item in items if item['hash']}) if cache else {}
+    todo = []
+    for item in items:
+        if item['hash'] is None:
+            item['error'] = 'could not decode image'
+        elif item['hash'] not in cached:
+            todo.append(item)
+    print(f"Scoring {len(todo)} images ({len(items) - len(todo)} cached or unreadable)")
+
+    scored = {}
+    for batch, decoded in prefetch_batches(todo, batch_size, threads):
+        valid = [i for i, (pixels, _) in enumerate(decoded) if pixels is not None]
+        for i, (_, error) in enumerate(decoded):
+            if error:
+                batch[i]['error'] = error
+        if not valid:
+            continue
+        images = np.stack([
+            np.frombuffer(decoded[i][0], dtype=np.uint8).reshape(INPUT_SHAPE) for i in valid
+        ])
+        probs = predict_batch(model, prepare(images))
+        rows = []
+        for i, p in zip(valid, probs):
+            scored[id(batch[i])] = p
+            if batch[i]['hash']:
+                rows.append((batch[i]['hash'], p))
+        if cache and rows:
+            cache.put_many(model_id, rows)
+
+    records = []
+    for item in items:
+        record = dict.fromkeys(CSV_FIELDS)
+        record.update({'class': item['class'], 'file': item['file'], 'hash': item['hash'], 'error': item.get('error')})
+        probs = cached.get(item['hash'])
+        record['cached'] = probs is not None
+        if probs is None:
+            probs = scored.get(id(item))
+        if probs is not None:
+            top = int(np.argmax(probs))
+            record['predicted'] = labels[top] if top < len(labels) else str(top)
+            record['confidence'] = round(float(probs[top]), 4)
+            label_id = labels.index(item['class']) if item['class'] in labels else None
+            record['label_probability'] = None if label_id is None else round(float(probs[label_id]), 4)
+            record['flagged'] = record['predicted'] != item['class'] or record['confidence'] < min_confidence
+        records.append(record)
+    return records
+
+
+def summarize(records):
+    classes = {}
+    for record in records:
+        summary = classes.setdefault(record['class'], {'count': 0, 'flagged': 0, 'errors': 0, 'predicted': {}})
+        summary['count'] += 1
+        if record['error'] or record['predicted'] is None:
+            summary['errors'] += 1
+            continue
+        summary['predicted'][record['predicted']] = summary['predicted'].get(record['predicted'], 0) + 1
+        if record['flagged']:
+            summary['flagged'] += 1
+    return classes
+
+
+def write_report(records, output, labels):
+    report = {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'labels': labels,
+        'total_images': len(records),
+        'classes': summarize(records),
+        'flagged': [
+            {key: r[key] for key in ('class', 'file', 'predicted', 'confidence', 'label_probability')}
+            for r in records if r['flagged']
+        ]
+    }
+    with open(f"{output}.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    with open(f"{output}.csv", 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(records)
+    return report
+
+
+def quarantine(save_path, records):
+    # Flagged files move under <root>/.quarantine/<class>/; the next hash index sync drops them
+    moved = 0
+    for record in records:
+        if not record['flagged']:
+            continue
+        source = os.path.join(save_path, record['class'], record['file'])
+        if not os.path.exists(source):
+            continue
+        target_dir = os.path.join(save_path, QUARANTINE_DIR, record['class'])
+        os.makedirs(target_dir, exist_ok=True)
+        shutil.move(source, os.path.join(target_dir, record['file']))
+        moved += 1
+    return moved
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check scraped labels with the ResNet50 model")
+    parser.add_argument('--root', default='./dataset/raw')
+    parser.add_argument('--shards', default=None, help="classify packed shards in this folder instead of --root")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--labels', nargs='+', default=None, help="model output classes in order (default: sorted class folders)")
+    parser.add_argument('--output', default='./dataset/label_report')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--min-confidence', type=float, default=MIN_CONFIDENCE)
+    parser.add_argument('--quarantine', action='store_true', help="move flagged images out of their class folder")
+    parser.add_argument('classes', nargs='*', help="class folders to check (default: all)")
+    args = parser.parse_args()
+
+    available = list_shard_classes(args.shards) if args.shards else list_classes(args.root)
+    class_names = args.classes or available
+    labels = args.labels or available
+
+    start = time.time()
+    if args.shards:
+        items = shard_items(args.shards, class_names)
+    else:
+        items = [item for class_name in class_names for item in folder_items(args.root, class_name)]
+
+    cache = PredictionCache(os.path.join(args.root, '.index', 'predictions.sqlite'))
+    records = classify_items(
+        items, load_model(args.model), labels, cache=cache, model_id=model_key(args.model),
+        batch_size=args.batch_size, threads=args.threads, min_confidence=args.min_confidence
+    )
+    cache.close()
+    report = write_report(records, args.output, labels)
+
+    for class_name, summary in report['classes'].items():
+        print(f"{class_name}: {summary['count']} images, {summary['flagged']} flagged, {summary['errors']} unreadable")
+    if args.quarantine and not args.shards:
+        print(f"🚚 Moved {quarantine(args.root, records)} flagged images to {os.path.join(args.root, QUARANTINE_DIR)}")
+    print(f"\nClassified {len(records)} images in {time.time() - start:.1f}s")
+    print(f"Report written to {args.output}.json and {args.output}.csv")
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import threading
+import time
+
+COUNTERS = ('thumbnails', 'resolved', 'saved', 'duplicate', 'rejected', 'failed', 'seen')
+
+
+class CrawlJournal:
+    """Append-only progress log for one search term, kept in the class's SQLite database (WAL mode).
+
+    Every event is committed as it happens, so a restarted run knows which
+    thumbnails were handled, where API pagination stopped and whether the
+    term was already finished.
+    """
+
+    def __init__(self, db_path, term):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.term = term
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal_terms ("
+            "term TEXT PRIMARY KEY, status TEXT, cursor TEXT, "
+            + ", ".join(f"{name} INTEGER DEFAULT 0" for name in COUNTERS)
+            + ", updated REAL)"
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS journal_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, term TEXT, kind TEXT, key TEXT, value TEXT, ts REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS journal_events_term ON journal_events (term, kind)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS journal_events_key ON journal_events (term, kind, key)")
+        self.conn.execute(
+            "INSERT OR IGNORE INTO journal_terms (term, status, updated) VALUES (?, 'new', ?)",
+            (term, time.time())
+        )
+        self.conn.commit()
+
+    def _append(self, kind, key=None, value=None, counter=None):
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO journal_events (term, kind, key, value, ts) VALUES (?, ?, ?, ?, ?)",
+                (self.term, kind, key, value, time.time())
+            )
+            if counter:
+                self.conn.execute(
+                    f"UPDATE journal_terms SET {counter} = {counter} + 1, updated = ? WHERE term = ?",
+                    (time.time(), self.term)
+                )
+            self.conn.commit()
+
+    def _term_row(self, column):
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT {column} FROM journal_terms WHERE term = ?", (self.term,)
+            ).fetchone()[0]
+
+    @property
+    def status(self):
+        return self._term_row('status')
+
+    @property
+    def cursor(self):
+        return self._term_row('cursor')
+
+    def is_finished(self):
+        return self.status == 'finished'
+
+    def set_status(self, status):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE journal_terms SET status = ?, updated = ? WHERE term = ?",
+                (status, time.time(), self.term)
+            )
+            self.conn.commit()
+        self._append('status', value=status)
+
+    def set_cursor(self, cursor):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE journal_terms SET cursor = ?, updated = ? WHERE term = ?",
+                (cursor, time.time(), self.term)
+            )
+            self.conn.commit()
+
+    def reset(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM journal_events WHERE term = ?", (self.term,))
+            self.conn.execute(
+                "UPDATE journal_terms SET status = 'new', cursor = NULL, "
+                + ", ".join(f"{name} = 0" for name in COUNTERS)
+                + " WHERE term = ?",
+                (self.term,)
+            )
+            self.conn.commit()
+
+    def processed_thumbnails(self):
+        with self.lock:
+            return {
+                key for (key,) in self.conn.execute(
+                    "SELECT key FROM journal_events WHERE term = ? AND kind = 'thumbnail'", (self.term,)
+                )
+            }
+
+    def unfinished_urls(self):
+        # Urls handed to the download queue that never got an outcome, because the run stopped first
+        with self.lock:
+            return [
+                key for (key,) in self.conn.execute(
+                    "SELECT key FROM journal_events AS resolved WHERE term = ? AND kind = 'resolved' "
+                    "AND NOT EXISTS (SELECT 1 FROM journal_events WHERE term = resolved.term "
+                    "AND kind = 'outcome' AND key = resolved.key) "
+                    "GROUP BY key ORDER BY MIN(id)", (self.term,)
+                )
+            ]
+
+    def log_thumbnail(self, thumbnail_key):
+        self._append('thumbnail', thumbnail_key, counter='thumbnails')
+
+    def log_resolved(self, img_url, thumbnail_key=None):
+        self._append('resolved', img_url, thumbnail_key, 'resolved')
+
+    def log_outcome(self, img_url, outcome):
+        self._append('outcome', img_url, outcome, outcome if outcome in COUNTERS else None)
+
+    def counts(self):
+        with self.lock:
+            row = self.conn.execute(
+                f"SELECT {', '.join(COUNTERS)} FROM journal_terms WHERE term = ?", (self.term,)
+            ).fetchone()
+        return dict(zip(COUNTERS, row))
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,78 @@
+import re
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DDG_BASE_URL = 'https://duckduckgo.com'
+VQD_PATTERN = re.compile(r'vqd=["\']?([\d-]+)')
+
+
+class DdgApiError(Exception):
+    pass
+
+
+class DdgImageClient:
+    """Reads DuckDuckGo image results from the i.js JSON endpoint that backs the results page."""
+
+    def __init__(self, base_url=DDG_BASE_URL, headers=None, timeout=10, region='us-en', pool_size=16):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.region = region
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(headers or {})
+        self.session.headers['Referer'] = f"{self.base_url}/"
+
+    def get_vqd(self, query):
+        # The results page embeds a per-query token that the JSON endpoint requires
+        response = self.session.get(
+            f"{self.base_url}/",
+            params={'q': query, 'iax': 'images', 'ia': 'images'},
+            timeout=self.timeout
+        )
+        match = VQD_PATTERN.search(response.text)
+        if response.status_code != 200 or not match:
+            raise DdgApiError(f"No vqd token for '{query}' (HTTP {response.status_code})")
+        return match.group(1)
+
+    def iter_results(self, query, max_pages=None, start_url=None, on_page=None):
+        # start_url resumes from a saved "next" link; on_page(next_url) is called after each page is consumed
+        vqd = self.get_vqd(query)
+        if start_url:
+            url, params = urljoin(f"{self.base_url}/", start_url), {'vqd': vqd}
+        else:
+            url = f"{self.base_url}/i.js"
+            params = {'l': self.region, 'o': 'json', 'q': query, 'vqd': vqd, 'f': ',,,,,', 'p': '1'}
+
+        pages = 0
+        while url:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            if response.status_code != 200:
+                raise DdgApiError(f"Results page returned HTTP {response.status_code}")
+            try:
+                data = response.json()
+            except ValueError:
+                raise DdgApiError("Results page was not JSON")
+
+            for result in data.get('results', []):
+                yield result
+
+            pages += 1
+            next_url = data.get('next')
+            if on_page:
+                on_page(next_url)
+            if not next_url or (max_pages and pages >= max_pages):
+                break
+            # "next" is relative and does not carry the token
+            url, params = urljoin(f"{self.base_url}/", next_url), {'vqd': vqd}
+
+    def iter_image_urls(self, query, max_pages=None, start_url=None, on_page=None):
+        for result in self.iter_results(query, max_pages=max_pages, start_url=start_url, on_page=on_page):
+            if result.get('image'):
+                yield result['image']
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,118 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+class DriverPool:
+    """Keeps up to `size` warmed browser sessions and hands them out to term workers.
+
+    Sessions are reset between uses instead of relaunched, and recycled after
+    max_pages navigations or once the page's JS heap passes max_heap_mb.
+    """
+
+    def __init__(self, factory, size=2, max_pages=50, max_heap_mb=512, reset_url='about:blank'):
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.max_heap_mb = max_heap_mb
+        self.reset_url = reset_url
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._pages = {}
+        self._closed = False
+
+    def acquire(self, timeout=None, **factory_kwargs):
+        # factory_kwargs only apply when a new session has to be launched
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                driver = self.factory(**factory_kwargs)
+                if driver is None:
+                    with self._lock:
+                        self._created -= 1
+                    return None
+                self._pages[id(driver)] = 0
+                return driver
+
+            # Poll so a slot freed by a discarded session is noticed, not just returned sessions
+            wait = 1 if deadline is None else min(1, deadline - time.monotonic())
+            if wait <= 0:
+                return None
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                continue
+
+    def note_page(self, driver):
+        self._pages[id(driver)] = self._pages.get(id(driver), 0) + 1
+
+    def heap_mb(self, driver):
+        try:
+            driver.execute_cdp_cmd('Performance.enable', {})
+            metrics = driver.execute_cdp_cmd('Performance.getMetrics', {})['metrics']
+            used = next(m['value'] for m in metrics if m['name'] == 'JSHeapUsedSize')
+            return used / (1024 * 1024)
+        except Exception:
+            return 0
+
+    def needs_recycle(self, driver):
+        if self._pages.get(id(driver), 0) >= self.max_pages:
+            return True
+        return bool(self.max_heap_mb) and self.heap_mb(driver) >= self.max_heap_mb
+
+    def reset(self, driver):
+        driver.delete_all_cookies()
+        driver.execute_script("try { localStorage.clear(); sessionStorage.clear(); } catch (e) {}")
+        driver.get(self.reset_url)
+
+    def release(self, driver, healthy=True):
+        if driver is None:
+            return
+        if healthy and not self._closed and not self.needs_recycle(driver):
+            try:
+                self.reset(driver)
+                self._idle.put(driver)
+                return
+            except Exception as e:
+                print(f"Failed to reset browser session, recycling it: {str(e)[:100]}")
+        self.discard(driver)
+
+    def discard(self, driver):
+        self._pages.pop(id(driver), None)
+        with self._lock:
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def session(self, **factory_kwargs):
+        driver = self.acquire(**factory_kwargs)
+        healthy = True
+        try:
+            yield driver
+        except Exception:
+            healthy = False
+            raise
+        finally:
+            self.release(driver, healthy)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self.discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
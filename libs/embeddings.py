@@ -0,0 +1,205 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from classify import MODEL_PATH, BATCH_SIZE, folder_items, shard_items, prefetch_batches, resnet50_preprocess, predict_batch, model_key
+from hash_index import list_classes
+from shards import list_shard_classes
+from tensor_cache import INPUT_SHAPE
+
+SIMILARITY_THRESHOLD = 0.95
+BLOCK_SIZE = 4096
+TOP_OUTLIERS = 20
+
+
+def load_backbone(path=MODEL_PATH, layer_name=None):
+    # Same lazy TensorFlow import as classify.load_model; defaults to the last 2-D layer before the classifier head
+    from tensorflow import keras
+    model = keras.models.load_model(path, compile=False)
+    if layer_name:
+        layer = model.get_layer(layer_name)
+    else:
+        layer = next(
+            layer for layer in reversed(model.layers[:-1])
+            if len(layer.output.shape) == 2 and not isinstance(layer, keras.layers.Dropout)
+        )
+    return keras.Model(model.input, layer.output)
+
+
+def _paths(cache_dir):
+    return os.path.join(cache_dir, 'embeddings.f16'), os.path.join(cache_dir, 'embeddings.index.json')
+
+
+def _read_index(cache_dir):
+    with open(_paths(cache_dir)[1]) as f:
+        return json.load(f)
+
+
+def load_embeddings(cache_dir):
+    # Returns a read-only (N, D) float16 memmap of unit vectors and the matching (class, file, hash) entries
+    data_file, _ = _paths(cache_dir)
+    index = _read_index(cache_dir)
+    vectors = np.memmap(data_file, dtype=np.float16, mode='r', shape=(len(index['entries']), index['dim']))
+    return vectors, index['entries']
+
+
+def build_embeddings(items, model, cache_dir, batch_size=BATCH_SIZE, threads=None, prepare=resnet50_preprocess,
+                     classes=None, model_id='model'):
+    """Embed every decodable item and store the L2-normalized vectors as float16.
+
+    Vectors from the previous store are copied over by image hash, so only new
+    images go through the model. classes names the classes items were scanned
+    from (default: the classes present in items); entries of every other class
+    are kept from the previous store as they are. model_id names the model and
+    layer; a store built by a different one is discarded.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    data_file, index_file = _paths(cache_dir)
+    rescanned = set(classes) if classes is not None else {item['class'] for item in items}
+    previous, previous_entries, previous_rows = None, [], {}
+    if os.path.exists(index_file) and _read_index(cache_dir).get('model') != model_id:
+        print("Embedding store was built by another model or layer, re-embedding from scratch")
+    elif os.path.exists(index_file):
+        previous, previous_entries = load_embeddings(cache_dir)
+        previous_rows = {entry['hash']: row for row, entry in enumerate(previous_entries)}
+
+    items = [item for item in items if item['hash']]
+    todo = [item for item in items if item['hash'] not in previous_rows]
+    print(f"Embedding {len(todo)} images ({len(items) - len(todo)} reused)")
+
+    fresh = {}
+    for batch, decoded in prefetch_batches(todo, batch_size, threads):
+        valid = [i for i, (pixels, _) in enumerate(decoded) if pixels is not None]
+        if not valid:
+            continue
+        images = np.stack([np.frombuffer(decoded[i][0], dtype=np.uint8).reshape(INPUT_SHAPE) for i in valid])
+        features = predict_batch(model, prepare(images)).reshape(len(valid), -1)
+        features /= np.maximum(np.linalg.norm(features, axis=1, keepdims=True), 1e-12)
+        for i, vector in zip(valid, features.astype(np.float16)):
+            fresh[batch[i]['hash']] = vector
+
+    # (entry, previous row) for classes that were not re-scanned, then the scanned items
+    kept = [(entry, row) for row, entry in enumerate(previous_entries) if entry['class'] not in rescanned]
+    kept += [
+        ({'class': item['class'], 'file': item['file'], 'hash': item['hash']}, previous_rows.get(item['hash']))
+        for item in items if item['hash'] in previous_rows or item['hash'] in fresh
+    ]
+    entries = [entry for entry, _ in kept]
+    if fresh:
+        dim = len(next(iter(fresh.values())))
+    elif previous is not None:
+        dim = previous.shape[1]
+    else:
+        dim = 0
+
+    tmp_data = f"{data_file}.tmp"
+    vectors = np.memmap(tmp_data, dtype=np.float16, mode='w+', shape=(max(len(entries), 1), max(dim, 1)))
+    for row, (entry, previous_row) in enumerate(kept):
+        vector = fresh.get(entry['hash'])
+        vectors[row] = vector if vector is not None else previous[previous_row]
+    vectors.flush()
+    del vectors, previous
+    os.replace(tmp_data, data_file)
+
+    tmp_index = f"{index_file}.tmp"
+    with open(tmp_index, 'w') as f:
+        json.dump({'dim': dim, 'model': model_id, 'entries': entries}, f)
+    os.replace(tmp_index, index_file)
+    return len(todo), len(entries)
+
+
+def similar_pairs(vectors, threshold=SIMILARITY_THRESHOLD, block_size=BLOCK_SIZE):
+    # Blocked upper-triangle matmul: only block_size x block_size similarities exist at once
+    n = len(vectors)
+    for start in range(0, n, block_size):
+        left = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+        for other in range(start, n, block_size):
+            right = left if other == start else np.asarray(vectors[other:other + block_size], dtype=np.float32)
+            sims = left @ right.T
+            rows, cols = np.nonzero(sims >= threshold)
+            for i, j in zip(rows, cols):
+                if other == start and j <= i:
+                    continue
+                yield start + int(i), other + int(j), float(sims[i, j])
+
+
+def class_outliers(vectors, entries, top=TOP_OUTLIERS, block_size=BLOCK_SIZE):
+    # Images least similar to their class centroid
+    labels = np.array([entry['class'] for entry in entries])
+    outliers = {}
+    for class_name in np.unique(labels):
+        rows = np.nonzero(labels == class_name)[0]
+        centroid = np.zeros(vectors.shape[1], dtype=np.float32)
+        for start in range(0, len(rows), block_size):
+            centroid += np.asarray(vectors[rows[start:start + block_size]], dtype=np.float32).sum(axis=0)
+        centroid /= max(np.linalg.norm(centroid), 1e-12)
+        scores = np.concatenate([
+            np.asarray(vectors[rows[start:start + block_size]], dtype=np.float32) @ centroid
+            for start in range(0, len(rows), block_size)
+        ])
+        order = np.argsort(scores)[:top]
+        outliers[str(class_name)] = [
+            {'file': entries[rows[i]]['file'], 'similarity': round(float(scores[i]), 4)} for i in order
+        ]
+    return outliers
+
+
+def analyze(vectors, entries, threshold=SIMILARITY_THRESHOLD, top=TOP_OUTLIERS):
+    duplicates, leakage = [], []
+    for i, j, sim in similar_pairs(vectors, threshold):
+        pair = {
+            'a': f"{entries[i]['class']}/{entries[i]['file']}",
+            'b': f"{entries[j]['class']}/{entries[j]['file']}",
+            'similarity': round(sim, 4)
+        }
+        (duplicates if entries[i]['class'] == entries[j]['class'] else leakage).append(pair)
+    return {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'total_images': len(entries),
+        'similarity_threshold': threshold,
+        'semantic_duplicates': duplicates,
+        'cross_class_leakage': leakage,
+        'outliers': class_outliers(vectors, entries, top)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed images with the ResNet50 backbone and look for semantic duplicates")
+    parser.add_argument('--root', default='./dataset/raw')
+    parser.add_argument('--shards', default=None, help="embed packed shards in this folder instead of --root")
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--layer', default=None, help="embedding layer name (default: penultimate)")
+    parser.add_argument('--cache', default='./dataset/cache')
+    parser.add_argument('--output', default='./dataset/embedding_report.json')
+    parser.add_argument('--threshold', type=float, default=SIMILARITY_THRESHOLD)
+    parser.add_argument('--top', type=int, default=TOP_OUTLIERS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--skip-embed', action='store_true', help="only query the existing embedding store")
+    parser.add_argument('classes', nargs='*', help="class folders to embed (default: all)")
+    args = parser.parse_args()
+
+    start = time.time()
+    if not args.skip_embed:
+        if args.shards:
+            class_names = args.classes or list_shard_classes(args.shards)
+            items = shard_items(args.shards, class_names)
+        else:
+            class_names = args.classes or list_classes(args.root)
+            items = [item for class_name in class_names for item in folder_items(args.root, class_name)]
+        build_embeddings(items, load_backbone(args.model, args.layer), args.cache,
+                         batch_size=args.batch_size, threads=args.threads, classes=class_names,
+                         model_id=f"{model_key(args.model)}:{args.layer or 'penultimate'}")
+
+    vectors, entries = load_embeddings(args.cache)
+    report = analyze(vectors, entries, args.threshold, args.top)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{len(report['semantic_duplicates'])} semantic duplicate pairs, "
+          f"{len(report['cross_class_leakage'])} cross-class pairs above {args.threshold}")
+    print(f"\nAnalyzed {report['total_images']} images in {time.time() - start:.1f}s")
+    print(f"Report written to {args.output}")
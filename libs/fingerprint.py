@@ -0,0 +1,71 @@
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+HASH_SIZE = 8
+# Decoding only needs a few times the hash resolution; JPEG draft mode decodes at 1/2..1/8 scale
+DECODE_SIZE = HASH_SIZE * 8
+# Never a valid average hash: at least one pixel is always <= the mean
+INVALID_HASH = np.uint64(0xFFFFFFFFFFFFFFFF)
+CHUNK_SIZE = 256
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(source))
+    return Image.open(source)
+
+
+def load_hash_pixels(source):
+    with _open(source) as img:
+        img.draft('L', (DECODE_SIZE, DECODE_SIZE))
+        img = img.convert('L')
+        factor = min(img.size) // DECODE_SIZE
+        if factor > 1:
+            img = img.reduce(factor)
+        img = img.resize((HASH_SIZE, HASH_SIZE), Image.LANCZOS)
+        return np.asarray(img, dtype=np.uint8).reshape(-1)
+
+
+def average_hashes(pixels):
+    # pixels is (N, 64); bit order matches str(imagehash.average_hash(...))
+    bits = pixels > pixels.mean(axis=1, keepdims=True)
+    return np.packbits(bits, axis=1).view('>u8').reshape(-1).astype(np.uint64)
+
+
+def _hash_chunk(sources):
+    pixels = np.zeros((len(sources), HASH_SIZE * HASH_SIZE), dtype=np.uint8)
+    valid = np.ones(len(sources), dtype=bool)
+    for i, source in enumerate(sources):
+        try:
+            pixels[i] = load_hash_pixels(source)
+        except Exception:
+            valid[i] = False
+    hashes = average_hashes(pixels)
+    hashes[~valid] = INVALID_HASH
+    return hashes
+
+
+def fingerprint_batch(sources, workers=None, chunk_size=CHUNK_SIZE):
+    # sources are file paths or raw image bytes; undecodable entries come back as INVALID_HASH
+    sources = list(sources)
+    if not sources:
+        return np.empty(0, dtype=np.uint64)
+    if workers == 1 or len(sources) <= chunk_size:
+        return _hash_chunk(sources)
+
+    chunks = [sources[i:i + chunk_size] for i in range(0, len(sources), chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+        return np.concatenate(list(executor.map(_hash_chunk, chunks)))
+
+
+def hash_to_hex(value):
+    return format(int(value), '016x')
+
+
+def hex_hashes(sources, workers=None):
+    # Index-ready form: 16-hex strings, None for anything that could not be decoded
+    return [None if img_hash == INVALID_HASH else hash_to_hex(img_hash) for img_hash in fingerprint_batch(sources, workers)]
@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import threading
+import time
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Rows reserved by a download that is still being written; size is -1 and mtime_ns the reservation time
+PENDING_PREFIX = '.pending-'
+PENDING_TTL_NS = 10 * 60 * 10 ** 9
+
+
+def list_classes(root):
+    # Class folders under a dataset root; dot folders such as .index and .quarantine are not classes
+    return sorted(
+        name for name in os.listdir(root)
+        if not name.startswith('.') and os.path.isdir(os.path.join(root, name))
+    )
+
+
+def index_path(save_path, class_name):
+    return os.path.join(save_path, '.index', f"{class_name}.sqlite")
+
+
+class HashIndex:
+    """On-disk map of file name -> (size, mtime, perceptual hash) for one class folder."""
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        # Several crawler processes may share one class database
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_table()
+        self._last_seq = 0
+
+    def _create_table(self):
+        # seq only ever goes up (AUTOINCREMENT never reuses a deleted maximum), so other processes
+        # can pull new rows with seq > last seen; plain rowids are handed out again after a delete
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            columns = [row[1] for row in self.conn.execute("PRAGMA table_info(files)")]
+            if columns and 'seq' not in columns:
+                self.conn.execute("ALTER TABLE files RENAME TO files_old")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT UNIQUE, size INTEGER, mtime_ns INTEGER, hash TEXT)"
+            )
+            if columns and 'seq' not in columns:
+                self.conn.execute(
+                    "INSERT INTO files (name, size, mtime_ns, hash) "
+                    "SELECT name, size, mtime_ns, hash FROM files_old ORDER BY rowid"
+                )
+                self.conn.execute("DROP TABLE files_old")
+        finally:
+            self.conn.commit()
+
+    def sync(self, images_dir, hash_files, extensions=IMAGE_EXTENSIONS):
+        # Cheap directory diff against the stored (size, mtime); only new or changed files get hashed.
+        # hash_files takes a list of paths and returns one hash (or None if unreadable) per path.
+        with self.lock:
+            known = {
+                name: (size, mtime_ns)
+                for name, size, mtime_ns in self.conn.execute("SELECT name, size, mtime_ns FROM files")
+            }
+
+        current = {}
+        with os.scandir(images_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(extensions) and entry.is_file():
+                    st = entry.stat()
+                    current[entry.name] = (st.st_size, st.st_mtime_ns)
+
+        stale = time.time_ns() - PENDING_TTL_NS
+        removed = [
+            name for name, (size, mtime_ns) in known.items()
+            if name not in current and not (name.startswith(PENDING_PREFIX) and mtime_ns > stale)
+        ]
+        changed = [name for name, signature in current.items() if known.get(name) != signature]
+        hashes = hash_files([os.path.join(images_dir, name) for name in changed]) if changed else []
+        rows = []
+        for name, img_hash in zip(changed, hashes):
+            if img_hash is None:
+                print(f"Error processing {name}: could not decode image")
+            rows.append((name, current[name][0], current[name][1], img_hash))
+
+        with self.lock:
+            self.conn.executemany("DELETE FROM files WHERE name = ?", [(name,) for name in removed])
+            self.conn.executemany("INSERT OR REPLACE INTO files (name, size, mtime_ns, hash) VALUES (?, ?, ?, ?)", rows)
+            self.conn.commit()
+        return len(rows), len(removed)
+
+    def add(self, name, size, mtime_ns, img_hash):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO files (name, size, mtime_ns, hash) VALUES (?, ?, ?, ?)", (name, size, mtime_ns, img_hash))
+            self.conn.commit()
+
+    def remove(self, name):
+        with self.lock:
+            self.conn.execute("DELETE FROM files WHERE name = ?", (name,))
+            self.conn.commit()
+
+    def items(self):
+        with self.lock:
+            # Read the high-water mark first: rows landing in between are pulled again by reserve, never skipped
+            self._last_seq = self.conn.execute("SELECT COALESCE(MAX(seq), 0) FROM files").fetchone()[0]
+            rows = self.conn.execute(
+                "SELECT seq, name, hash FROM files WHERE name NOT LIKE ? ORDER BY name", (PENDING_PREFIX + '%',)
+            ).fetchall()
+        return [(name, img_hash) for _, name, img_hash in rows]
+
+    def count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def reserve(self, img_hash, known, quota):
+        # Atomic across processes (BEGIN IMMEDIATE): pull in hashes other writers added since the
+        # last call, reject duplicates, enforce the class quota and claim the next image number.
+        # Returns ('duplicate' | 'full' | <pending name>, image count).
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for seq, name, other_hash in self.conn.execute(
+                    "SELECT seq, name, hash FROM files WHERE seq > ?", (self._last_seq,)
+                ).fetchall():
+                    self._last_seq = max(self._last_seq, seq)
+                    if other_hash is not None:
+                        known.add(other_hash, name)
+                count = self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+                if img_hash in known:
+                    return 'duplicate', count
+                if count >= quota:
+                    return 'full', count
+                pending = f"{PENDING_PREFIX}{os.getpid()}-{img_hash}"
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO files (name, size, mtime_ns, hash) VALUES (?, -1, ?, ?)", (pending, time.time_ns(), img_hash)
+                )
+                return pending, count + 1
+            finally:
+                self.conn.commit()
+
+    def complete(self, pending, file_path, img_hash):
+        st = os.stat(file_path)
+        with self.lock:
+            self.conn.execute("DELETE FROM files WHERE name = ?", (pending,))
+            self.conn.execute(
+                "INSERT OR REPLACE INTO files (name, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                (os.path.basename(file_path), st.st_size, st.st_mtime_ns, img_hash)
+            )
+            self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
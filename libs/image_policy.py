@@ -0,0 +1,77 @@
+from PIL import ImageFile
+
+
+class ImageRejected(Exception):
+    pass
+
+
+class ImagePolicy:
+    """What an image must look like to be kept; checked from headers as bytes arrive."""
+
+    def __init__(self, allowed_modes=('RGB',), allowed_formats=('JPEG', 'PNG', 'WEBP'),
+                 min_width=100, min_height=100, max_width=10000, max_height=10000,
+                 max_bytes=20 * 1024 * 1024, chunk_size=16 * 1024):
+        self.allowed_modes = allowed_modes
+        self.allowed_formats = allowed_formats
+        self.min_width = min_width
+        self.min_height = min_height
+        self.max_width = max_width
+        self.max_height = max_height
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+
+    def check_headers(self, headers):
+        content_type = headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and not content_type.startswith('image/') and content_type != 'application/octet-stream':
+            return f"Content-Type {content_type}"
+        try:
+            content_length = int(headers.get('Content-Length', 0))
+        except ValueError:
+            content_length = 0
+        if self.max_bytes and content_length > self.max_bytes:
+            return f"Content-Length {content_length} over {self.max_bytes}"
+        return None
+
+    def check_image(self, image_format, mode, width, height):
+        if self.allowed_formats and image_format not in self.allowed_formats:
+            return f"format {image_format}"
+        if self.allowed_modes and mode not in self.allowed_modes:
+            return f"non-RGB image (Mode: {mode})"
+        if width < self.min_width or height < self.min_height:
+            return f"too small ({width}x{height})"
+        if width > self.max_width or height > self.max_height:
+            return f"too large ({width}x{height})"
+        return None
+
+
+def read_image_stream(response, policy):
+    # Returns the full body, or raises ImageRejected as soon as the headers or
+    # the image header fail the policy so the rest of the transfer is never read
+    reason = policy.check_headers(response.headers)
+    if reason:
+        raise ImageRejected(reason)
+
+    parser = ImageFile.Parser()
+    data = bytearray()
+    checked = False
+    for chunk in response.iter_content(policy.chunk_size):
+        data += chunk
+        if policy.max_bytes and len(data) > policy.max_bytes:
+            raise ImageRejected(f"body over {policy.max_bytes} bytes")
+        if checked:
+            continue
+        try:
+            parser.feed(chunk)
+        except Exception as e:
+            raise ImageRejected(f"not an image ({e})")
+        if parser.image:
+            img = parser.image
+            reason = policy.check_image(img.format, img.mode, img.size[0], img.size[1])
+            if reason:
+                raise ImageRejected(reason)
+            # Header accepted: stop feeding so the parser doesn't decode pixels we don't need yet
+            checked = True
+
+    if not checked:
+        raise ImageRejected("not an image")
+    return bytes(data)
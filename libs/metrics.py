@@ -0,0 +1,236 @@
+import cProfile
+import functools
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        i = 0
+        while i < len(self.buckets) and value > self.buckets[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket holding the q-th observation
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for i, bucket_count in enumerate(self.counts):
+            upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+            if seen + bucket_count >= rank and bucket_count:
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+            lower = upper
+        return self.buckets[-1]
+
+
+class Metrics:
+    """Process-wide timing spans, histograms and counters for the crawler stages."""
+
+    def __init__(self, prefix='scraper'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.started = time.time()
+        self._snapshot_thread = None
+
+    def observe(self, name, seconds):
+        with self.lock:
+            if name not in self.histograms:
+                self.histograms[name] = Histogram()
+            self.histograms[name].observe(seconds)
+
+    def inc(self, name, amount=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def timed(self, name):
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = time.time() - self.started
+            return {
+                'pid': os.getpid(),
+                'timestamp': time.time(),
+                'uptime_seconds': elapsed,
+                'counters': dict(self.counters),
+                'spans': {
+                    name: {
+                        'count': h.count,
+                        'total_seconds': h.sum,
+                        'mean_seconds': h.sum / h.count if h.count else None,
+                        'p50_seconds': h.quantile(0.5),
+                        'p99_seconds': h.quantile(0.99),
+                        'per_second': h.count / elapsed if elapsed else None
+                    }
+                    for name, h in self.histograms.items()
+                }
+            }
+
+    def to_prometheus(self):
+        lines = []
+        with self.lock:
+            for name, value in sorted(self.counters.items()):
+                metric = f"{self.prefix}_{name}_total"
+                lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{metric} {value}")
+            for name, h in sorted(self.histograms.items()):
+                metric = f"{self.prefix}_{name}_seconds"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bucket, bucket_count in zip(h.buckets, h.counts):
+                    cumulative += bucket_count
+                    lines.append(f'{metric}_bucket{{le="{bucket}"}} {cumulative}')
+                lines.append(f'{metric}_bucket{{le="+Inf"}} {h.count}')
+                lines.append(f"{metric}_sum {h.sum}")
+                lines.append(f"{metric}_count {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # <path>.json snapshot plus <path>.prom for a Prometheus textfile collector, both replaced atomically
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        for suffix, content in (('.json', json.dumps(self.snapshot(), indent=2)), ('.prom', self.to_prometheus())):
+            tmp_path = f"{path}{suffix}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, f"{path}{suffix}")
+
+    def start_snapshots(self, path, interval=30):
+        if self._snapshot_thread:
+            return
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.write(path)
+                except Exception as e:
+                    print(f"Could not write metrics: {e}")
+
+        self._snapshot_thread = threading.Thread(target=loop, daemon=True)
+        self._snapshot_thread.start()
+
+
+METRICS = Metrics()
+
+
+def _thread_profilers(stop):
+    # Before 3.12 cProfile only sees the thread that enables it, so every thread started while the hook
+    # is installed gets its own profiler. Its timer turns it off at the thread's first event once stop is
+    # set, and only marks it stopped (the last step, with no bytecode that can switch threads after it)
+    # when the profiler is done recording. Returns (threading hook, [(thread, profiler)], {id: profiler})
+    profilers = []
+    stopped = {}
+
+    def profile_thread(frame, event, arg):
+        if stop:
+            sys.setprofile(None)
+            return
+        thread_profiler = None
+
+        def timer():
+            now = time.perf_counter()
+            if stop:
+                sys.setprofile(None)
+                stopped[id(thread_profiler)] = thread_profiler
+            return now
+
+        thread_profiler = cProfile.Profile(timer)
+        profilers.append((threading.current_thread(), thread_profiler))
+        thread_profiler.enable()
+
+    return profile_thread, profilers, stopped
+
+
+def _stats(thread_profiler):
+    # Reads a stopped profiler without disable(), which would act on the calling thread instead of its own
+    thread_profiler.snapshot_stats()
+    return pstats.Stats(_Snapshot(thread_profiler.stats))
+
+
+class _Snapshot:
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+@contextmanager
+def profile(name, output_dir, top=30):
+    # cProfile + tracemalloc around one block; writes <name>.prof, <name>.txt and <name>.mem.txt.
+    # From 3.12 one profiler sees every thread. Before that, threads started inside the block (the
+    # download pipeline workers) get their own profilers, merged once they have stopped; pool threads
+    # still idle when the block ends stop at their next event and are left out
+    os.makedirs(output_dir, exist_ok=True)
+    base = os.path.join(output_dir, name)
+    profiler = cProfile.Profile()
+    per_thread = sys.version_info < (3, 12)
+    stop = []
+    if per_thread:
+        hook, profilers, stopped = _thread_profilers(stop)
+        previous = threading.getprofile()
+        threading.setprofile(hook)
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        stats = pstats.Stats(profiler)
+        summary = "all threads profiled"
+        if per_thread:
+            stop.append(True)
+            threading.setprofile(previous)
+            done = [p for thread, p in list(profilers) if id(p) in stopped or not thread.is_alive()]
+            for thread_profiler in done:
+                stats.add(_stats(thread_profiler))
+            summary = f"{len(done) + 1} threads profiled, {len(profilers) - len(done)} still running left out"
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        stats.dump_stats(f"{base}.prof")
+        with open(f"{base}.txt", 'w') as f:
+            stats.stream = f
+            f.write(f"{summary}\n")
+            stats.sort_stats('cumulative').print_stats(top)
+        with open(f"{base}.mem.txt", 'w') as f:
+            f.write(f"current={current} peak={peak}\n")
+            for stat in snapshot.statistics('lineno')[:top]:
+                f.write(f"{stat}\n")
+        print(f"Profile for {name} written to {base}.*")
@@ -0,0 +1,76 @@
+import numpy as np
+
+DEFAULT_THRESHOLD = 4
+HASH_BITS = 64
+
+
+def hash_to_int(img_hash):
+    if isinstance(img_hash, str):
+        # md5 fallbacks are longer than 64 bits; their first 16 hex digits are as good as the whole
+        return int(img_hash[:16], 16)
+    return int(img_hash)
+
+
+def _popcount64(values):
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, HASH_BITS).sum(axis=1)
+
+
+class NearDuplicateIndex:
+    """Multi-index hashing over 64-bit perceptual hashes.
+
+    Each hash is split into threshold + 1 chunks. Two hashes within the Hamming
+    threshold must agree exactly on at least one chunk, so a lookup only
+    verifies the few entries sharing a chunk with the query. Not thread-safe;
+    callers serialize access.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD):
+        self.threshold = threshold
+        num_chunks = threshold + 1
+        widths = [HASH_BITS // num_chunks + (1 if i < HASH_BITS % num_chunks else 0) for i in range(num_chunks)]
+        self._chunks = []
+        shift = HASH_BITS
+        for width in widths:
+            shift -= width
+            self._chunks.append((shift, (1 << width) - 1))
+        self._tables = [{} for _ in self._chunks]
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._keys = []
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, img_hash):
+        return self.find(img_hash) is not None
+
+    def _chunk_values(self, value):
+        return [(value >> shift) & mask for shift, mask in self._chunks]
+
+    def find(self, img_hash):
+        # Returns (key, distance) of the closest indexed hash within the threshold, or None
+        value = hash_to_int(img_hash)
+        candidates = set()
+        for table, chunk in zip(self._tables, self._chunk_values(value)):
+            ids = table.get(chunk)
+            if ids:
+                candidates.update(ids)
+        if not candidates:
+            return None
+
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        distances = _popcount64(self._hashes[ids] ^ np.uint64(value))
+        best = int(np.argmin(distances))
+        if distances[best] > self.threshold:
+            return None
+        return self._keys[ids[best]], int(distances[best])
+
+    def add(self, img_hash, key=None):
+        value = hash_to_int(img_hash)
+        entry_id = len(self._keys)
+        if entry_id == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros(len(self._hashes), dtype=np.uint64)])
+        self._hashes[entry_id] = value
+        self._keys.append(img_hash if key is None else key)
+        for table, chunk in zip(self._tables, self._chunk_values(value)):
+            table.setdefault(chunk, []).append(entry_id)
+        return entry_id
@@ -0,0 +1,74 @@
+import queue
+import threading
+from urllib.parse import urlparse
+
+_STOP = object()
+
+
+class DownloadPipeline:
+    """Bounded producer/consumer queue feeding a pool of download threads.
+
+    The browser thread only calls submit(); workers call handler(url, *extra)
+    concurrently, with at most per_host_limit requests in flight per host
+    (None leaves per-host pacing to the handler).
+    """
+
+    def __init__(self, handler, num_workers=8, queue_size=32, per_host_limit=4, stopped=None):
+        self.handler = handler
+        self.per_host_limit = per_host_limit
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.stopped = stopped or threading.Event()
+        self._host_slots = {}
+        self._host_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _host_slot(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._host_lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._host_slots[host]
+
+    def submit(self, url, *extra):
+        # Blocks while the queue is full, so the browser never outruns the downloaders
+        if self.stopped.is_set():
+            return False
+        self.queue.put((url, extra))
+        return True
+
+    def stop(self):
+        # Queued urls are drained without being handled
+        self.stopped.set()
+
+    def pending(self):
+        return self.queue.qsize()
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self.stopped.is_set():
+                    continue
+                url, extra = item
+                if self.per_host_limit is None:
+                    self.handler(url, *extra)
+                else:
+                    with self._host_slot(url):
+                        self.handler(url, *extra)
+            except Exception as e:
+                print(f"\n❌ Download worker error: {str(e)[:100]}")
+            finally:
+                self.queue.task_done()
+
+    def close(self):
+        for _ in self._workers:
+            self.queue.put(_STOP)
+        for worker in self._workers:
+            worker.join()
@@ -0,0 +1,110 @@
+# Slice length handed to a term before the planner looks at its yield again
+SLICE_SECONDS = 180
+# Unique images per minute below which a term counts as saturated
+MIN_YIELD = 0.5
+DEFAULT_MODIFIERS = ('photo', 'cattle', 'farm', 'pasture', 'herd', 'close up', 'breed', 'livestock')
+
+
+def query_variants(term, modifiers=DEFAULT_MODIFIERS):
+    # Cheap rewrites of a productive term; the search engine returns a different mix for each
+    words = term.lower().split()
+    return [f"{term} {modifier}" for modifier in modifiers if modifier not in words]
+
+
+class TermYield:
+    def __init__(self, term):
+        self.term = term
+        self.saved = 0
+        self.seconds = 0.0
+        self.slices = 0
+        self.rate = None
+        self.finished = False
+
+    @property
+    def saturated(self):
+        return self.finished or (self.rate is not None and self.rate < MIN_YIELD)
+
+
+class QueryPlanner:
+    """Hands out (term, time slice) pairs per class by measured unique images per minute.
+
+    Untried terms go first. After that the term with the best recent yield
+    gets the next slice, and productive terms get longer slices. A term that
+    drops below MIN_YIELD or reports itself exhausted stops being scheduled.
+    Once every term of a class is saturated, variants of its most productive
+    terms are added, up to max_variants per class.
+    """
+
+    def __init__(self, batch_terms, slice_seconds=SLICE_SECONDS, alpha=0.5, max_variants=8, expand=query_variants):
+        self.terms = {class_name: {term: TermYield(term) for term in terms} for class_name, terms in batch_terms.items()}
+        self.slice_seconds = slice_seconds
+        self.alpha = alpha
+        self.max_variants = max_variants
+        self.expand = expand
+        self.variants_added = {class_name: 0 for class_name in batch_terms}
+
+    def has_terms(self, class_name):
+        return any(not stats.saturated for stats in self.terms[class_name].values()) or self._can_expand(class_name)
+
+    def _can_expand(self, class_name):
+        return self.variants_added[class_name] < self.max_variants
+
+    def _expand(self, class_name, busy):
+        terms = self.terms[class_name]
+        ranked = sorted(terms.values(), key=lambda stats: stats.saved / max(stats.seconds, 1), reverse=True)
+        for stats in ranked:
+            for variant in self.expand(stats.term):
+                if variant in terms or variant in busy:
+                    continue
+                terms[variant] = TermYield(variant)
+                self.variants_added[class_name] += 1
+                print(f"\nAll terms saturated for {class_name}, trying variant: {variant}")
+                return variant
+        # Nothing left to rewrite
+        self.variants_added[class_name] = self.max_variants
+        return None
+
+    def next_term(self, class_name, busy=()):
+        # Returns (term, seconds) or None; busy holds terms already running in another worker
+        unsaturated = [stats for stats in self.terms[class_name].values() if not stats.saturated]
+        candidates = [stats for stats in unsaturated if stats.term not in busy]
+        if not candidates:
+            # Terms still running elsewhere may be productive: only rewrite once every term is saturated
+            if unsaturated or not self._can_expand(class_name):
+                return None
+            term = self._expand(class_name, busy)
+            return (term, self.slice_seconds) if term else None
+
+        untried = [stats for stats in candidates if stats.rate is None]
+        if untried:
+            return untried[0].term, self.slice_seconds
+        best = max(candidates, key=lambda stats: stats.rate)
+        return best.term, self.slice_for(class_name, best)
+
+    def slice_for(self, class_name, stats):
+        # Longer slices for terms beating the class median, shorter for the laggards
+        rates = sorted(s.rate for s in self.terms[class_name].values() if s.rate is not None and not s.finished)
+        median = rates[len(rates) // 2] if rates else stats.rate
+        if not median:
+            return self.slice_seconds
+        return self.slice_seconds * min(2.0, max(0.5, stats.rate / median))
+
+    def record(self, class_name, term, saved, seconds, finished):
+        stats = self.terms[class_name].setdefault(term, TermYield(term))
+        stats.saved += saved
+        stats.seconds += seconds
+        stats.slices += 1
+        stats.finished = stats.finished or finished
+        rate = saved / max(seconds / 60, 1e-6)
+        stats.rate = rate if stats.rate is None else self.alpha * rate + (1 - self.alpha) * stats.rate
+        return stats
+
+    def summary(self):
+        return {
+            class_name: {
+                term: {'saved': s.saved, 'minutes': round(s.seconds / 60, 1),
+                       'per_minute': None if s.rate is None else round(s.rate, 2), 'finished': s.finished}
+                for term, s in terms.items()
+            }
+            for class_name, terms in self.terms.items()
+        }
@@ -0,0 +1,196 @@
+import concurrent.futures
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+import requests
+
+DEFAULT_TEST_URLS = [
+    'https://www.bing.com',
+    'https://www.yahoo.com',
+    'https://duckduckgo.com'
+]
+
+
+def _new_score():
+    return {
+        'latency': None,
+        'successes': 0,
+        'failures': 0,
+        'consecutive_failures': 0,
+        'open_until': 0
+    }
+
+
+class ProxyPool:
+    """Scores proxies by latency EWMA and success rate, with a circuit breaker per proxy.
+
+    Scores are persisted to state_path so a new process starts warm.
+    """
+
+    def __init__(self, proxies, state_path=None, test_urls=DEFAULT_TEST_URLS, timeout=5,
+                 alpha=0.3, failure_threshold=3, cooldown=300, refresh_interval=600,
+                 sample_size=5, max_cold_batches=10, headers=None):
+        self.state_path = state_path
+        self.test_urls = list(test_urls)
+        self.timeout = timeout
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.refresh_interval = refresh_interval
+        self.sample_size = sample_size
+        self.max_cold_batches = max_cold_batches
+        self.headers = headers or {}
+        self.lock = threading.Lock()
+        self.scores = {proxy: _new_score() for proxy in proxies}
+        self._stop = threading.Event()
+        self._refresher = None
+        self.load()
+
+    def load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path) as f:
+                saved = json.load(f)
+        except Exception as e:
+            print(f"Could not load proxy scores: {e}")
+            return
+        with self.lock:
+            for proxy, score in saved.items():
+                if proxy in self.scores:
+                    self.scores[proxy].update(score)
+
+    def save(self):
+        if not self.state_path:
+            return
+        with self.lock:
+            data = json.dumps(self.scores)
+        # Several threads and crawler processes save concurrently: each writes its own temp file, and
+        # losing one snapshot is fine, so a failed save is reported but never raised into the caller
+        directory = os.path.dirname(self.state_path) or '.'
+        tmp_path = None
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.proxy_scores-', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(data)
+            os.replace(tmp_path, self.state_path)
+        except OSError as e:
+            print(f"Could not save proxy scores: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def probe(self, proxy):
+        # Returns the mean latency over the test urls, or None if any of them fails
+        proxies = {
+            'http': f'http://{proxy}',
+            'https': f'http://{proxy}'
+        }
+        start = time.monotonic()
+        try:
+            for url in self.test_urls:
+                response = requests.get(url, proxies=proxies, headers=self.headers, timeout=self.timeout)
+                if response.status_code != 200:
+                    return None
+        except Exception:
+            return None
+        return (time.monotonic() - start) / len(self.test_urls)
+
+    def record_success(self, proxy, latency):
+        with self.lock:
+            score = self.scores.setdefault(proxy, _new_score())
+            if score['latency'] is None:
+                score['latency'] = latency
+            else:
+                score['latency'] = self.alpha * latency + (1 - self.alpha) * score['latency']
+            score['successes'] += 1
+            score['consecutive_failures'] = 0
+            score['open_until'] = 0
+
+    def record_failure(self, proxy):
+        with self.lock:
+            score = self.scores.setdefault(proxy, _new_score())
+            score['failures'] += 1
+            score['consecutive_failures'] += 1
+            # A half-open proxy (cooldown over, not yet re-proven) trips again on its first failure
+            if score['consecutive_failures'] >= self.failure_threshold or score['open_until']:
+                score['open_until'] = time.time() + self.cooldown
+
+    def check(self, proxy):
+        latency = self.probe(proxy)
+        if latency is None:
+            self.record_failure(proxy)
+            return False
+        self.record_success(proxy, latency)
+        return True
+
+    def _available(self, score, now):
+        return score['open_until'] <= now
+
+    def _rank(self, score):
+        success_rate = (score['successes'] + 1) / (score['successes'] + score['failures'] + 2)
+        return score['latency'] / success_rate
+
+    def ranked(self):
+        now = time.time()
+        with self.lock:
+            scored = [
+                (self._rank(score), proxy) for proxy, score in self.scores.items()
+                if self._available(score, now) and score['latency'] is not None
+            ]
+        return [proxy for _, proxy in sorted(scored)]
+
+    def refresh(self, candidates=None):
+        if candidates is None:
+            candidates = self.refresh_candidates()
+        if not candidates:
+            return
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.sample_size) as executor:
+            list(executor.map(self.check, candidates))
+        self.save()
+
+    def refresh_candidates(self):
+        # Re-measure every proxy that has a score plus a random sample of the rest
+        now = time.time()
+        with self.lock:
+            known = [p for p, s in self.scores.items() if s['latency'] is not None and self._available(s, now)]
+            unknown = [p for p, s in self.scores.items() if s['latency'] is None and self._available(s, now)]
+        return known + random.sample(unknown, min(self.sample_size, len(unknown)))
+
+    def best(self):
+        ranked = self.ranked()
+        if ranked:
+            return ranked[0]
+
+        # Cold start: probe untested proxies a batch at a time until one works
+        now = time.time()
+        with self.lock:
+            untested = [p for p, s in self.scores.items() if s['latency'] is None and self._available(s, now)]
+        random.shuffle(untested)
+        for batch_start in range(0, min(len(untested), self.sample_size * self.max_cold_batches), self.sample_size):
+            self.refresh(untested[batch_start:batch_start + self.sample_size])
+            ranked = self.ranked()
+            if ranked:
+                return ranked[0]
+        return None
+
+    def start_background_refresh(self):
+        if self._refresher and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Proxy refresh failed: {e}")
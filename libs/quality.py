@@ -0,0 +1,175 @@
+import argparse
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from fingerprint import hex_hashes
+from hash_index import HashIndex, IMAGE_EXTENSIONS, index_path, list_classes
+
+# Scores are computed on a fixed-size grayscale decode so whole chunks stack into one array
+QUALITY_SIZE = 256
+CHUNK_SIZE = 64
+# Laplacian variance at which an image counts as fully sharp, and the short side that counts as full resolution
+SHARP_VARIANCE = 500.0
+FULL_RESOLUTION = 512
+WEIGHTS = {'sharpness': 0.4, 'entropy': 0.2, 'resolution': 0.2, 'exposure': 0.2}
+METRICS = ('width', 'height', 'sharpness', 'entropy', 'brightness', 'clipped', 'score')
+
+
+def load_quality_pixels(path):
+    with Image.open(path) as img:
+        width, height = img.size
+        img.draft('L', (QUALITY_SIZE, QUALITY_SIZE))
+        img = img.convert('L').resize((QUALITY_SIZE, QUALITY_SIZE), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8), width, height
+
+
+def quality_scores(pixels, widths, heights):
+    # pixels is (N, QUALITY_SIZE, QUALITY_SIZE) uint8; returns one column per name in METRICS
+    x = pixels.astype(np.float32)
+    laplacian = 4 * x[:, 1:-1, 1:-1] - x[:, :-2, 1:-1] - x[:, 2:, 1:-1] - x[:, 1:-1, :-2] - x[:, 1:-1, 2:]
+    sharpness = laplacian.var(axis=(1, 2))
+
+    n = len(pixels)
+    flat = pixels.reshape(n, -1)
+    counts = np.bincount((flat + np.arange(n)[:, None] * 256).ravel(), minlength=n * 256).reshape(n, 256)
+    p = counts / flat.shape[1]
+    entropy = -(p * np.log2(np.where(p > 0, p, 1))).sum(axis=1)
+
+    brightness = flat.mean(axis=1)
+    clipped = ((flat <= 5) | (flat >= 250)).mean(axis=1)
+
+    widths = np.asarray(widths, dtype=np.float32)
+    heights = np.asarray(heights, dtype=np.float32)
+    score = (
+        WEIGHTS['sharpness'] * np.minimum(np.log1p(sharpness) / np.log1p(SHARP_VARIANCE), 1)
+        + WEIGHTS['entropy'] * entropy / 8
+        + WEIGHTS['resolution'] * np.minimum(np.minimum(widths, heights) / FULL_RESOLUTION, 1)
+        + WEIGHTS['exposure'] * np.clip(1 - clipped - np.abs(brightness - 128) / 256, 0, 1)
+    )
+    return np.stack([widths, heights, sharpness, entropy, brightness, clipped, score], axis=1)
+
+
+def _score_chunk(paths):
+    pixels = np.zeros((len(paths), QUALITY_SIZE, QUALITY_SIZE), dtype=np.uint8)
+    sizes = np.zeros((len(paths), 2), dtype=np.float32)
+    valid = np.ones(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        try:
+            pixels[i], sizes[i, 0], sizes[i, 1] = load_quality_pixels(path)
+        except Exception:
+            valid[i] = False
+    scores = quality_scores(pixels, sizes[:, 0], sizes[:, 1])
+    return [row.tolist() if ok else None for row, ok in zip(scores, valid)]
+
+
+def score_files(paths, workers=None, chunk_size=CHUNK_SIZE):
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    if len(chunks) <= 1:
+        return _score_chunk(paths) if paths else []
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_scores in executor.map(_score_chunk, chunks):
+            results.extend(chunk_scores)
+    return results
+
+
+class QualityCache:
+    """Quality metrics per image hash, kept next to the class hash index."""
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            f"CREATE TABLE IF NOT EXISTS quality (hash TEXT PRIMARY KEY, {', '.join(f'{m} REAL' for m in METRICS)})"
+        )
+        self.conn.commit()
+
+    def get_all(self):
+        return {row[0]: dict(zip(METRICS, row[1:])) for row in self.conn.execute("SELECT * FROM quality")}
+
+    def put_many(self, rows):
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO quality VALUES ({', '.join('?' * (len(METRICS) + 1))})",
+            [(img_hash, *values) for img_hash, values in rows]
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def score_class(save_path, class_name, workers=None):
+    # Returns [(name, metrics or None)]; only images whose hash has no cached score get decoded
+    images_dir = os.path.join(save_path, class_name)
+    index = HashIndex(index_path(save_path, class_name))
+    index.sync(images_dir, hex_hashes, IMAGE_EXTENSIONS)
+    files = index.items()
+    index.close()
+
+    cache = QualityCache(index_path(save_path, class_name))
+    scores = cache.get_all()
+    todo = [(name, img_hash) for name, img_hash in files if img_hash and img_hash not in scores]
+    if todo:
+        print(f"Scoring {len(todo)} {class_name} images ({len(files) - len(todo)} cached or unreadable)")
+        results = score_files([os.path.join(images_dir, name) for name, _ in todo], workers)
+        rows = [(img_hash, values) for (_, img_hash), values in zip(todo, results) if values is not None]
+        cache.put_many(rows)
+        scores.update((img_hash, dict(zip(METRICS, values))) for img_hash, values in rows)
+    cache.close()
+    return [(name, scores.get(img_hash)) for name, img_hash in files]
+
+
+def prune_class(save_path, class_name, target, dry_run=False, workers=None):
+    # Deletes the lowest-scoring images (unreadable ones first) until target remain
+    scored = score_class(save_path, class_name, workers)
+    excess = len(scored) - target
+    if excess <= 0:
+        print(f"{class_name}: {len(scored)} images, already at or under {target}")
+        return []
+
+    scored.sort(key=lambda item: -1 if item[1] is None else item[1]['score'])
+    victims = scored[:excess]
+    images_dir = os.path.join(save_path, class_name)
+    index = None if dry_run else HashIndex(index_path(save_path, class_name))
+    for name, metrics in victims:
+        score = 'unreadable' if metrics is None else f"{metrics['score']:.3f}"
+        if dry_run:
+            print(f"Would delete: {name} (score {score})")
+            continue
+        try:
+            os.remove(os.path.join(images_dir, name))
+            index.remove(name)
+            print(f"Deleted: {name} (score {score})")
+        except Exception as e:
+            print(f"Error deleting {name}: {str(e)}")
+    if index:
+        index.close()
+
+    verb = "Would delete" if dry_run else "Deleted"
+    print(f"\n{verb} {len(victims)} of {len(scored)} images from {class_name}, keeping {target}")
+    return victims
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score image quality and prune each class down to a target count")
+    parser.add_argument('--root', default='./dataset/raw')
+    parser.add_argument('--target', type=int, default=None, help="images to keep per class (omit to only score)")
+    parser.add_argument('--dry-run', action='store_true', help="list what would be deleted without deleting")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('classes', nargs='*', help="class folders to score (default: all)")
+    args = parser.parse_args()
+
+    class_names = args.classes or list_classes(args.root)
+    for class_name in class_names:
+        if args.target is None:
+            scored = [metrics['score'] for _, metrics in score_class(args.root, class_name, args.workers) if metrics]
+            if scored:
+                print(f"{class_name}: {len(scored)} scored, median {np.median(scored):.3f}, "
+                      f"lowest {min(scored):.3f}, highest {max(scored):.3f}")
+        else:
+            prune_class(args.root, class_name, args.target, dry_run=args.dry_run, workers=args.workers)
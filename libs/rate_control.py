@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class HostLimiter:
+    """AIMD concurrency window for one host.
+
+    Every success grows the window by increase/limit (about +increase per
+    round trip); a 429, 5xx, connection error or latency spike multiplies it
+    by decrease, at most once per round trip (median latency). Time to
+    headers is sampled separately: timeouts and hedging race the send, which
+    returns at the headers for streamed bodies.
+    """
+
+    def __init__(self, initial=2, minimum=1, maximum=32, increase=1.0, decrease=0.5,
+                 spike_factor=3.0, window=200, min_samples=20):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.spike_factor = spike_factor
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.header_latencies = deque(maxlen=window)
+        self.in_flight = 0
+        self.blocked_until = 0
+        self._last_cut = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        with self._cond:
+            while True:
+                delay = self.blocked_until - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                elif self.in_flight >= int(self.limit):
+                    self._cond.wait()
+                else:
+                    self.in_flight += 1
+                    return
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    def _percentile(self, samples, q):
+        with self._cond:
+            if len(samples) < self.min_samples:
+                return None
+            ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def percentile(self, q):
+        return self._percentile(self.latencies, q)
+
+    def header_percentile(self, q):
+        return self._percentile(self.header_latencies, q)
+
+    def on_headers(self, latency):
+        with self._cond:
+            self.header_latencies.append(latency)
+
+    def on_success(self, latency):
+        p95 = self.percentile(0.95)
+        if p95 is not None and latency > self.spike_factor * p95:
+            self.on_overload()
+        else:
+            with self._cond:
+                self.limit = min(self.maximum, self.limit + self.increase / self.limit)
+                self._cond.notify_all()
+        with self._cond:
+            self.latencies.append(latency)
+
+    def on_overload(self, retry_after=None):
+        round_trip = self.percentile(0.5) or 0.1
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_cut >= round_trip:
+                self.limit = max(self.minimum, self.limit * self.decrease)
+                self._last_cut = now
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+class RateController:
+    """Per-host AIMD limiting, latency-derived timeouts, retries and hedged requests."""
+
+    def __init__(self, default_timeout=10, min_timeout=3, max_timeout=30, retries=2,
+                 hedge=True, min_hedge_delay=0.25, hedge_budget=0.1, pool_size=64, **limiter_kwargs):
+        self.default_timeout = default_timeout
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.retries = retries
+        self.hedge = hedge
+        self.min_hedge_delay = min_hedge_delay
+        self.hedge_budget = hedge_budget
+        self.limiter_kwargs = limiter_kwargs
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._limiters = {}
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._hedges = 0
+        self._executor = ThreadPoolExecutor(max_workers=pool_size)
+
+    def limiter(self, url):
+        host = urlparse(url).netloc.lower()
+        with self._lock:
+            if host not in self._limiters:
+                self._limiters[host] = HostLimiter(**self.limiter_kwargs)
+            return self._limiters[host]
+
+    def timeout_for(self, limiter):
+        p95 = limiter.header_percentile(0.95)
+        if p95 is None:
+            return self.default_timeout
+        return min(self.max_timeout, max(self.min_timeout, 4 * p95))
+
+    def _count_request(self):
+        with self._lock:
+            self._requests += 1
+
+    def _allow_hedge(self):
+        # The budget is a share of every request sent, not only of the slow ones
+        with self._lock:
+            if self._hedges < self.hedge_budget * self._requests:
+                self._hedges += 1
+                return True
+            return False
+
+    def _send(self, url, kwargs):
+        start = time.monotonic()
+        response = self.session.get(url, **kwargs)
+        return response, time.monotonic() - start
+
+    def _hedged_send(self, limiter, url, kwargs):
+        self._count_request()
+        primary = self._executor.submit(self._send, url, kwargs)
+        p95 = limiter.header_percentile(0.95)
+        if not self.hedge or p95 is None:
+            return primary.result()
+
+        done, _ = wait([primary], timeout=max(self.min_hedge_delay, p95))
+        if done or not self._allow_hedge():
+            return primary.result()
+
+        # The primary is past this host's p95: race a second copy and keep whichever answers first
+        backup = self._executor.submit(self._send, url, kwargs)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                for loser in pending:
+                    loser.add_done_callback(_close_response)
+                return result
+        raise error
+
+    def fetch(self, url, consume=None, **kwargs):
+        # With consume, consume(response) reads the body while the host slot is still held and fetch
+        # returns its result; the latency sample then covers the whole transfer, not just the headers
+        limiter = self.limiter(url)
+        last_error = None
+        for attempt in range(self.retries + 1):
+            kwargs['timeout'] = self.timeout_for(limiter)
+            limiter.acquire()
+            try:
+                start = time.monotonic()
+                try:
+                    response, latency = self._hedged_send(limiter, url, kwargs)
+                except requests.RequestException as e:
+                    limiter.on_overload()
+                    last_error = e
+                    continue
+
+                overloaded = response.status_code == 429 or response.status_code >= 500
+                if not overloaded:
+                    limiter.on_headers(latency)
+                if overloaded:
+                    limiter.on_overload(_retry_after(response))
+                    if attempt < self.retries:
+                        response.close()
+                        continue
+                if consume is None:
+                    if not overloaded:
+                        limiter.on_success(latency)
+                    return response
+
+                try:
+                    result = consume(response)
+                except requests.RequestException as e:
+                    # A body that stalls or breaks mid-transfer counts like a failed send
+                    limiter.on_overload()
+                    last_error = e
+                    continue
+                finally:
+                    response.close()
+                if not overloaded:
+                    limiter.on_success(time.monotonic() - start)
+                return result
+            finally:
+                limiter.release()
+        raise last_error
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+def _close_response(future):
+    try:
+        future.result()[0].close()
+    except Exception:
+        pass
@@ -0,0 +1,69 @@
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from planner import QueryPlanner
+
+
+class CrawlScheduler:
+    """Runs (class, term, time slice) jobs on a pool of worker processes, most-starved class first.
+
+    remaining(class_name) reports how many images a class still needs; it is
+    read from the shared class index, so it reflects every worker's progress.
+    Which term a class works on next, and for how long, is up to the planner.
+    """
+
+    def __init__(self, batch_terms, remaining, workers=3, initializer=None, initargs=(), planner=None):
+        self.planner = planner or QueryPlanner(batch_terms)
+        self.class_names = list(batch_terms)
+        self.remaining = remaining
+        self.workers = workers
+        self.initializer = initializer
+        self.initargs = initargs
+        self.running = {}
+        self.closed = set()
+
+    def next_job(self):
+        # Highest remaining quota wins; classes already being worked on yield to idle ones
+        candidates = []
+        for class_name in self.class_names:
+            if class_name in self.closed:
+                continue
+            needed = self.remaining(class_name)
+            if needed <= 0 or not self.planner.has_terms(class_name):
+                self.closed.add(class_name)
+                continue
+            busy = [job[1] for job in self.running.values() if job[0] == class_name]
+            candidates.append((needed / (len(busy) + 1), class_name, busy))
+        for _, class_name, busy in sorted(candidates, reverse=True):
+            planned = self.planner.next_term(class_name, busy)
+            if planned:
+                return (class_name,) + planned
+        return None
+
+    def run(self, job_fn):
+        # job_fn(class_name, term, seconds) must be a picklable top-level function returning
+        # {'count', 'saved', 'elapsed', 'finished'} for the slice it ran
+        results = {}
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=self.initializer, initargs=self.initargs) as executor:
+            while True:
+                while len(self.running) < self.workers:
+                    job = self.next_job()
+                    if job is None:
+                        break
+                    print(f"\nScheduling {job[0]}: {job[1]} for {job[2]:.0f}s")
+                    self.running[executor.submit(job_fn, *job)] = job
+                if not self.running:
+                    break
+
+                finished, _ = wait(self.running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    class_name, term, _ = self.running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"Error scraping {term}: {e}")
+                        result = {'count': None, 'saved': 0, 'elapsed': 0, 'finished': True}
+                    stats = self.planner.record(class_name, term, result['saved'], result['elapsed'], result['finished'])
+                    results[(class_name, term)] = result['count']
+                    print(f"\nFinished slice of {class_name}: {term} "
+                          f"({result['saved']} new, {stats.rate:.1f}/min, {result['count']} images in class)")
+        return results
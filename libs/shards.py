@@ -0,0 +1,155 @@
+import argparse
+import io
+import json
+import os
+import tarfile
+
+from hash_index import IMAGE_EXTENSIONS, list_classes
+
+SHARD_SIZE = 256 * 1024 * 1024
+SHARD_PATTERN = "{class_name}-{index:05d}.tar"
+
+
+def _list_images(images_dir, extensions=IMAGE_EXTENSIONS):
+    with os.scandir(images_dir) as entries:
+        return sorted(
+            entry.name for entry in entries
+            if entry.name.lower().endswith(extensions) and entry.is_file()
+        )
+
+
+class ShardWriter:
+    """Writes WebDataset-style tar shards of about shard_size bytes each, plus an offset index.
+
+    The index records, per member, the shard file and the byte offset and size
+    of its data inside the tar, so a reader can seek straight to it.
+    """
+
+    def __init__(self, output_dir, class_name, shard_size=SHARD_SIZE):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.class_name = class_name
+        self.shard_size = shard_size
+        self.shard_index = -1
+        self.tar = None
+        self.shard_path = None
+        self.entries = []
+
+    def _next_shard(self):
+        if self.tar:
+            self.tar.close()
+        self.shard_index += 1
+        self.shard_path = os.path.join(
+            self.output_dir, SHARD_PATTERN.format(class_name=self.class_name, index=self.shard_index)
+        )
+        self.tar = tarfile.open(self.shard_path, 'w', format=tarfile.USTAR_FORMAT)
+
+    def write(self, name, data, mtime=0):
+        if self.tar is None or self.tar.fileobj.tell() + len(data) > self.shard_size:
+            self._next_shard()
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mtime = int(mtime)
+        header_offset = self.tar.fileobj.tell()
+        self.tar.addfile(info, io.BytesIO(data))
+        self.entries.append({
+            'name': name,
+            'label': self.class_name,
+            'shard': os.path.basename(self.shard_path),
+            # ustar members are a single 512-byte header followed by the data
+            'offset': header_offset + tarfile.BLOCKSIZE,
+            'size': len(data)
+        })
+
+    def close(self):
+        if self.tar:
+            self.tar.close()
+        index_file = os.path.join(self.output_dir, f"{self.class_name}.index.json")
+        tmp_path = f"{index_file}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'class': self.class_name, 'entries': self.entries}, f)
+        os.replace(tmp_path, index_file)
+        return index_file
+
+
+def export_class(save_path, class_name, output_dir, shard_size=SHARD_SIZE):
+    images_dir = os.path.join(save_path, class_name)
+    writer = ShardWriter(output_dir, class_name, shard_size)
+    for name in _list_images(images_dir):
+        path = os.path.join(images_dir, name)
+        with open(path, 'rb') as f:
+            writer.write(name, f.read(), os.path.getmtime(path))
+    writer.close()
+    return writer.entries
+
+
+class ShardReader:
+    """Random access by index entry and sequential streaming over one class's shards."""
+
+    def __init__(self, output_dir, class_name):
+        self.output_dir = output_dir
+        with open(os.path.join(output_dir, f"{class_name}.index.json")) as f:
+            self.entries = json.load(f)['entries']
+        self._handles = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _handle(self, shard):
+        if shard not in self._handles:
+            self._handles[shard] = open(os.path.join(self.output_dir, shard), 'rb')
+        return self._handles[shard]
+
+    def read(self, i):
+        entry = self.entries[i]
+        handle = self._handle(entry['shard'])
+        handle.seek(entry['offset'])
+        return handle.read(entry['size'])
+
+    def __iter__(self):
+        # Large sequential reads, one shard at a time, in write order
+        for shard in dict.fromkeys(entry['shard'] for entry in self.entries):
+            with tarfile.open(os.path.join(self.output_dir, shard), 'r|', bufsize=4 * 1024 * 1024) as tar:
+                for member in tar:
+                    if member.isfile():
+                        yield member.name, tar.extractfile(member).read()
+
+    def close(self):
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+
+def list_shard_classes(output_dir):
+    # Every class that has an index in a shard folder
+    return sorted(name[:-len('.index.json')] for name in os.listdir(output_dir) if name.endswith('.index.json'))
+
+
+def read_member(shard_path, offset, size):
+    # One member's bytes by its index entry; opens its own handle so any thread can call it
+    with open(shard_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(size)
+
+
+def iter_dataset(output_dir, class_names):
+    # Streams (label, name, bytes) for every class in turn
+    for class_name in class_names:
+        reader = ShardReader(output_dir, class_name)
+        for name, data in reader:
+            yield class_name, name, data
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pack class folders into tar shards with an offset index")
+    parser.add_argument('--root', default='./dataset/raw')
+    parser.add_argument('--output', default='./dataset/shards')
+    parser.add_argument('--shard-size-mb', type=int, default=SHARD_SIZE // (1024 * 1024))
+    parser.add_argument('classes', nargs='*', help="class folders to pack (default: all)")
+    args = parser.parse_args()
+
+    class_names = args.classes or list_classes(args.root)
+    for class_name in class_names:
+        entries = export_class(args.root, class_name, args.output, args.shard_size_mb * 1024 * 1024)
+        shards = len({entry['shard'] for entry in entries})
+        print(f"{class_name}: packed {len(entries)} images into {shards} shards")
@@ -0,0 +1,175 @@
+import argparse
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from fingerprint import hex_hashes
+from hash_index import HashIndex, IMAGE_EXTENSIONS, index_path, list_classes
+
+INPUT_SHAPE = (224, 224, 3)
+ROW_BYTES = INPUT_SHAPE[0] * INPUT_SHAPE[1] * INPUT_SHAPE[2]
+
+
+def preprocess(source):
+    # source is a path or raw image bytes; draft decode gets JPEGs to roughly the target size first
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        source = io.BytesIO(source)
+    with Image.open(source) as img:
+        img.draft('RGB', (INPUT_SHAPE[1], INPUT_SHAPE[0]))
+        img = img.convert('RGB').resize((INPUT_SHAPE[1], INPUT_SHAPE[0]), Image.BILINEAR)
+        return np.asarray(img, dtype=np.uint8).tobytes()
+
+
+def _preprocess_chunk(paths):
+    results = []
+    for path in paths:
+        try:
+            results.append(preprocess(path))
+        except Exception as e:
+            print(f"Error preprocessing {os.path.basename(path)}: {e}")
+            results.append(None)
+    return results
+
+
+def _paths(cache_dir, class_name):
+    base = os.path.join(cache_dir, class_name)
+    return f"{base}.u8", f"{base}.index.json"
+
+
+def _load_index(index_file, class_name):
+    if not os.path.exists(index_file):
+        return {'class': class_name, 'shape': list(INPUT_SHAPE), 'rows': 0, 'files': {}, 'free': []}
+    with open(index_file) as f:
+        return json.load(f)
+
+
+def update_class(save_path, class_name, cache_dir, workers=None, chunk_size=32):
+    """Bring one class's uint8 tensor file up to date with its folder.
+
+    Only new or changed files are decoded. Rows of removed files are reused,
+    and a file whose content hash already has a row (e.g. a rename) keeps it.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    data_file, index_file = _paths(cache_dir, class_name)
+    cache = _load_index(index_file, class_name)
+    images_dir = os.path.join(save_path, class_name)
+
+    # Synced first so a file rewritten under the same name is matched by its new hash, not the stale one
+    index = HashIndex(index_path(save_path, class_name))
+    index.sync(images_dir, hex_hashes, IMAGE_EXTENSIONS)
+    hashes = dict(index.items())
+    index.close()
+
+    current = {}
+    with os.scandir(images_dir) as entries:
+        for entry in entries:
+            if entry.name.lower().endswith(IMAGE_EXTENSIONS) and entry.is_file():
+                st = entry.stat()
+                current[entry.name] = [st.st_size, st.st_mtime_ns, hashes.get(entry.name)]
+
+    old_files = cache['files']
+    kept = {}
+    by_hash = {}
+    for name, entry in old_files.items():
+        signature = current.get(name)
+        if signature and signature[:2] == entry['signature'][:2]:
+            kept[name] = entry
+        elif entry['signature'][2]:
+            by_hash[entry['signature'][2]] = entry
+
+    todo = []
+    for name, signature in current.items():
+        if name in kept:
+            continue
+        previous = by_hash.pop(signature[2], None) if signature[2] else None
+        if previous:
+            kept[name] = {'row': previous['row'], 'signature': signature}
+        else:
+            todo.append(name)
+
+    live_rows = {entry['row'] for entry in kept.values()}
+    free = sorted(set(cache['free']) | {e['row'] for e in old_files.values() if e['row'] not in live_rows})
+    rows = cache['rows']
+    targets = []
+    for _ in todo:
+        if free:
+            targets.append(free.pop(0))
+        else:
+            targets.append(rows)
+            rows += 1
+
+    with open(data_file, 'ab') as f:
+        f.truncate(rows * ROW_BYTES)
+
+    if todo:
+        cache_array = np.memmap(data_file, dtype=np.uint8, mode='r+', shape=(rows,) + INPUT_SHAPE)
+        paths = [os.path.join(images_dir, name) for name in todo]
+        chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for chunk_results in executor.map(_preprocess_chunk, chunks):
+                results.extend(chunk_results)
+        for name, row, pixels in zip(todo, targets, results):
+            if pixels is None:
+                free.append(row)
+                continue
+            cache_array[row] = np.frombuffer(pixels, dtype=np.uint8).reshape(INPUT_SHAPE)
+            kept[name] = {'row': row, 'signature': current[name]}
+        cache_array.flush()
+        del cache_array
+
+    cache.update({'rows': rows, 'files': kept, 'free': sorted(free)})
+    tmp_path = f"{index_file}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, index_file)
+    return len(todo), len(kept)
+
+
+def load_class(cache_dir, class_name):
+    # Returns a read-only memmap over every row plus the sorted row numbers that hold live images
+    data_file, index_file = _paths(cache_dir, class_name)
+    cache = _load_index(index_file, class_name)
+    if not cache['rows']:
+        # An empty class has no data file to map (or an empty one, which mmap refuses)
+        return np.empty((0,) + INPUT_SHAPE, dtype=np.uint8), np.empty(0, dtype=np.int64)
+    array = np.memmap(data_file, dtype=np.uint8, mode='r', shape=(cache['rows'],) + INPUT_SHAPE)
+    rows = np.array(sorted(entry['row'] for entry in cache['files'].values()), dtype=np.int64)
+    return array, rows
+
+
+def iter_batches(cache_dir, class_names, batch_size=64, shuffle=True, seed=None):
+    # Yields (uint8 images, int labels); labels are positions in class_names
+    arrays = []
+    samples = []
+    for label, class_name in enumerate(class_names):
+        array, rows = load_class(cache_dir, class_name)
+        arrays.append(array)
+        samples.append(np.stack([np.full(len(rows), label), rows], axis=1))
+    samples = np.concatenate(samples) if samples else np.empty((0, 2), dtype=np.int64)
+    if shuffle:
+        np.random.default_rng(seed).shuffle(samples)
+    for start in range(0, len(samples), batch_size):
+        batch = samples[start:start + batch_size]
+        images = np.empty((len(batch),) + INPUT_SHAPE, dtype=np.uint8)
+        for i, (label, row) in enumerate(batch):
+            images[i] = arrays[label][row]
+        yield images, batch[:, 0]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally cache 224x224 RGB inputs as memory-mapped uint8 arrays")
+    parser.add_argument('--root', default='./dataset/raw')
+    parser.add_argument('--cache', default='./dataset/cache')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('classes', nargs='*', help="class folders to cache (default: all)")
+    args = parser.parse_args()
+
+    class_names = args.classes or list_classes(args.root)
+    for class_name in class_names:
+        processed, total = update_class(args.root, class_name, args.cache, workers=args.workers)
+        print(f"{class_name}: preprocessed {processed} new images, {total} cached")
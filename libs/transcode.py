@@ -0,0 +1,87 @@
+import io
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+class TranscodePolicy:
+    """What a saved file must be: one format and mode, a capped longest side, and the quality to re-encode at."""
+
+    def __init__(self, output_format='JPEG', allowed_modes=('RGB',), max_dimension=2048, quality=90,
+                 background=(255, 255, 255)):
+        self.output_format = output_format
+        self.allowed_modes = allowed_modes
+        self.max_dimension = max_dimension
+        self.quality = quality
+        self.background = background
+
+    @property
+    def extension(self):
+        return EXTENSIONS.get(self.output_format, '.' + self.output_format.lower())
+
+    def check(self, image_format, mode, width, height):
+        # Returns why the bytes can't be written as-is, or None to keep them untouched
+        if image_format != self.output_format:
+            return f"format {image_format}"
+        if self.allowed_modes and mode not in self.allowed_modes:
+            return f"mode {mode}"
+        if self.max_dimension and max(width, height) > self.max_dimension:
+            return f"size {width}x{height}"
+        return None
+
+
+def transcode(data, policy):
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        scale = min(1.0, policy.max_dimension / max(width, height)) if policy.max_dimension else 1.0
+        target = (max(1, round(width * scale)), max(1, round(height * scale)))
+        # JPEG sources decode straight at 1/2..1/8 scale when the target allows it
+        img.draft('RGB', target)
+        if img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info):
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, policy.background)
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        else:
+            img = img.convert('RGB')
+        if img.size != target:
+            img = img.resize(target, Image.LANCZOS, reducing_gap=3.0)
+        output = io.BytesIO()
+        img.save(output, policy.output_format, quality=policy.quality)
+        return output.getvalue()
+
+
+class Transcoder:
+    """Keeps bytes that already meet the policy and re-encodes the rest on a process pool.
+
+    Header checks run on the calling thread; only images that need a decode
+    and encode are shipped to the pool, which is started on first use.
+    """
+
+    def __init__(self, policy=None, workers=2):
+        self.policy = policy or TranscodePolicy()
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def check(self, data):
+        with Image.open(io.BytesIO(data)) as img:
+            return self.policy.check(img.format, img.mode, img.size[0], img.size[1])
+
+    def prepare(self, data):
+        # Returns (bytes to write, reason they were re-encoded or None)
+        reason = self.check(data)
+        if reason is None:
+            return data, None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor.submit(transcode, data, self.policy).result(), reason
+
+    def close(self):
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown()
+                self._executor = None
@@ -0,0 +1,97 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Outcomes that make a url never worth fetching again; transient failures are not recorded
+FINAL_OUTCOMES = ('saved', 'duplicate', 'rejected')
+TRACKING_PREFIXES = ('utm_',)
+
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    host = parts.hostname or ''
+    # DuckDuckGo's image proxy wraps the original url in ?u=
+    if host.endswith('duckduckgo.com') and parts.path.startswith('/iu'):
+        wrapped = dict(query).get('u')
+        if wrapped:
+            return normalize_url(wrapped)
+    port = parts.port
+    netloc = host if port in (None, 80, 443) else f"{host}:{port}"
+    query = sorted((k, v) for k, v in query if not k.lower().startswith(TRACKING_PREFIXES))
+    return urlunsplit((parts.scheme.lower(), netloc, parts.path or '/', urlencode(query), ''))
+
+
+def url_key(url):
+    # 8-byte digest of the normalized url, stored as a signed SQLite integer
+    digest = hashlib.blake2b(normalize_url(url).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+class UrlIndex:
+    """Per-class record of every image url already fetched, with its content hash and outcome.
+
+    Also maps search-result thumbnail hashes to the hash of the full image they
+    led to, so a known thumbnail can be skipped before it is resolved.
+    """
+
+    def __init__(self, db_path):
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "key INTEGER PRIMARY KEY, hash TEXT, outcome TEXT, updated REAL)"
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS thumbnails (thumb_hash TEXT PRIMARY KEY, hash TEXT)")
+        self.conn.commit()
+        self.thumbnails = dict(self.conn.execute("SELECT thumb_hash, hash FROM thumbnails"))
+        self.seen = {
+            key for (key,) in self.conn.execute(
+                f"SELECT key FROM urls WHERE outcome IN ({','.join('?' * len(FINAL_OUTCOMES))})",
+                FINAL_OUTCOMES
+            )
+        }
+
+    def __len__(self):
+        return len(self.seen)
+
+    def __contains__(self, url):
+        return url_key(url) in self.seen
+
+    def lookup(self, url):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT hash, outcome FROM urls WHERE key = ?", (url_key(url),)
+            ).fetchone()
+
+    def record(self, url, img_hash, outcome):
+        key = url_key(url)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO urls VALUES (?, ?, ?, ?)",
+                (key, img_hash, outcome, time.time())
+            )
+            self.conn.commit()
+            if outcome in FINAL_OUTCOMES:
+                self.seen.add(key)
+
+    def full_hash(self, thumb_hash):
+        return self.thumbnails.get(thumb_hash)
+
+    def record_thumbnail(self, thumb_hash, img_hash):
+        if self.thumbnails.get(thumb_hash) == img_hash:
+            return
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO thumbnails VALUES (?, ?)", (thumb_hash, img_hash))
+            self.conn.commit()
+            self.thumbnails[thumb_hash] = img_hash
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -10,83 +10,133 @@ import os
 import random
 import hashlib
 from proxies import proxies, user_agents
-import concurrent.futures
 import json
 from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
-from PIL import Image
-import io
-import imagehash
+import threading
+import functools
+from multiprocessing.util import Finalize
+from pipeline import DownloadPipeline
+from hash_index import HashIndex, index_path
+from near_duplicates import NearDuplicateIndex
+from proxy_pool import ProxyPool
+from driver_pool import DriverPool
+from scheduler import CrawlScheduler
+from planner import QueryPlanner
+from metrics import METRICS, profile
+from ddg_api import DdgImageClient, DdgApiError
+from rate_control import RateController
+from url_index import UrlIndex
+from crawl_journal import CrawlJournal
+from image_policy import ImagePolicy, ImageRejected, read_image_stream
+from fingerprint import fingerprint_batch, hash_to_hex, hex_hashes, INVALID_HASH
+from transcode import Transcoder, TranscodePolicy
 
-WORKING_PROXIES_CACHE = set()
 PROXY_TIMEOUT = 3
+PROXY_STATE_PATH = "dataset/.proxy_scores.json"
+DOWNLOAD_WORKERS = 16
+DOWNLOAD_QUEUE_SIZE = 32
+# Per-host concurrency is adapted by RATE_CONTROLLER instead of a fixed cap
+PER_HOST_DOWNLOADS = None
+CRAWL_WORKERS = 3
+TERM_SLICE_SECONDS = 180
+# "api" reads the results JSON directly and falls back to "selenium" if that fails
+SEARCH_BACKEND = "api"
+SEARCH_BASE_URL = "https://duckduckgo.com"
+API_MAX_PAGES = 20
+MAX_PAGES_PER_SESSION = 50
+MAX_SESSION_HEAP_MB = 512
+# Lean sessions skip fonts, media, favicons and trackers and run with capped caches and V8 heap
+LEAN_BROWSER = True
+LEAN_BLOCKED_URLS = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.mp3', '*.ico',
+    '*icons.duckduckgo.com/ip3/*', '*improving.duckduckgo.com/*',
+    '*doubleclick.net/*', '*googlesyndication.com/*', '*google-analytics.com/*', '*googletagmanager.com/*',
+    '*bat.bing.com/*'
+]
+LEAN_DISK_CACHE_MB = 32
+# Above MAX_SESSION_HEAP_MB so the pool recycles a session before V8 runs out of room
+LEAN_JS_HEAP_MB = 768
+SCROLL_WAIT = 1.0
+# Fingerprint each result thumbnail and skip the click-through when it matches an image we already own
+THUMBNAIL_PREDEDUP = True
+# Each harvest round scrolls until this many more tiles exist than last round
+THUMBNAIL_BATCH = 100
+METRICS_DIR = "dataset/.metrics"
+METRICS_INTERVAL = 30
+# Set PROFILE_TERM to a search term to run just that term under cProfile and tracemalloc
+PROFILE_TERM = os.environ.get("PROFILE_TERM")
+# Max differing bits between two average hashes that still count as the same photo
+NEAR_DUPLICATE_THRESHOLD = 4
+# Saved files are RGB JPEGs no larger than this; anything else is re-encoded off the download threads
+MAX_IMAGE_DIMENSION = 2048
+JPEG_QUALITY = 90
+TRANSCODE_WORKERS = 2
+# Source modes accepted at download time; the transcoder turns all of them into RGB before they are saved
+DOWNLOAD_MODES = ('RGB', 'RGBA', 'CMYK', 'L', 'LA', 'P', 'PA')
+
+PROXY_POOL = ProxyPool(
+    proxies,
+    state_path=PROXY_STATE_PATH,
+    headers={
+        'User-Agent': random.choice(user_agents),
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.5',
+        'Connection': 'keep-alive',
+        'DNT': '1'
+    }
+)
 
-def verify_proxy(proxy):
-    try:
-        headers = {
-            'User-Agent': random.choice(user_agents),
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Connection': 'keep-alive',
-            'DNT': '1'
-        }
-        proxies = {
-            'http': f'http://{proxy}',
-            'https': f'http://{proxy}'
-        }
-        # Test multiple URLs to ensure proxy works
-        test_urls = [
-            'https://www.bing.com',
-            'https://www.yahoo.com',
-            'https://duckduckgo.com'
-        ]
-        for url in test_urls:
-            response = requests.get(url, proxies=proxies, headers=headers, timeout=5)
-            if response.status_code != 200:
-                return False
-        return True
-    except:
-        return False
+RATE_CONTROLLER = RateController()
+IMAGE_POLICY = ImagePolicy(allowed_modes=DOWNLOAD_MODES)
+TRANSCODER = Transcoder(TranscodePolicy(max_dimension=MAX_IMAGE_DIMENSION, quality=JPEG_QUALITY), workers=TRANSCODE_WORKERS)
 
-def get_random_proxies(n=5):
-    return random.sample(proxies, min(n, len(proxies)))
+# Every probe, whether from best() or the background refresh, goes through check
+PROXY_POOL.check = METRICS.timed('verify_proxy')(PROXY_POOL.check)
 
 def get_working_proxy():
-    if WORKING_PROXIES_CACHE:
-        proxy = random.choice(list(WORKING_PROXIES_CACHE))
-        print(f"Using cached proxy: {proxy}")
+    print("Picking fastest healthy proxy...")
+    proxy = PROXY_POOL.best()
+    PROXY_POOL.start_background_refresh()
+    if proxy:
+        print(f"Found working proxy: {proxy}")
         return proxy
     
-    print("Testing random proxies...")
-    tested_proxies = set()
-    max_attempts = 10
-    
-    while len(tested_proxies) < len(proxies) and max_attempts > 0:
-        # Get 5 random untested proxies
-        candidates = [p for p in get_random_proxies() if p not in tested_proxies]
-        if not candidates:
-            break
-            
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            future_to_proxy = {executor.submit(verify_proxy, proxy): proxy for proxy in candidates}
-            
-            for future in concurrent.futures.as_completed(future_to_proxy):
-                proxy = future_to_proxy[future]
-                tested_proxies.add(proxy)
-                try:
-                    if future.result():
-                        executor.shutdown(wait=False)
-                        WORKING_PROXIES_CACHE.add(proxy)
-                        print(f"Found working proxy: {proxy}")
-                        return proxy
-                except:
-                    continue
-        
-        max_attempts -= 1
-    
     print("No working proxies found, trying without proxy")
     return None
 
-def setup_driver(use_proxy=True):
+def report_proxy_failure(driver):
+    proxy = getattr(driver, 'proxy', None)
+    if proxy:
+        PROXY_POOL.record_failure(proxy)
+        PROXY_POOL.save()
+
+def add_lean_options(options):
+    options.page_load_strategy = 'eager'
+    for argument in (
+        '--disable-background-networking', '--disable-sync', '--disable-translate', '--disable-default-apps',
+        '--disable-component-update', '--disable-notifications', '--no-first-run', '--mute-audio',
+        '--disable-features=Translate,OptimizationHints,MediaRouter,AutofillServerCommunication,InterestFeedContentSuggestions',
+        '--renderer-process-limit=1',
+        f'--disk-cache-size={LEAN_DISK_CACHE_MB * 1024 * 1024}',
+        '--media-cache-size=1',
+        f'--js-flags=--max-old-space-size={LEAN_JS_HEAP_MB}'
+    ):
+        options.add_argument(argument)
+    options.add_experimental_option('prefs', {
+        'profile.default_content_setting_values.notifications': 2,
+        'profile.managed_default_content_settings.plugins': 2,
+        'profile.managed_default_content_settings.geolocation': 2
+    })
+
+def block_resources(driver):
+    # Blocked at the network layer: requests fail fast without being sent. The setting lives on the
+    # DevTools session, so it survives DriverPool.reset between jobs
+    driver.execute_cdp_cmd('Network.enable', {})
+    driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS})
+
+@METRICS.timed('setup_driver')
+def setup_driver(use_proxy=True, lean=LEAN_BROWSER):
     options = ChromeOptions()
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
@@ -96,7 +146,10 @@ def setup_driver(use_proxy=True):
     options.add_argument('--disable-blink-features=AutomationControlled')
     options.add_experimental_option('excludeSwitches', ['enable-automation'])
     options.add_experimental_option('useAutomationExtension', False)
+    if lean:
+        add_lean_options(options)
     
+    proxy = None
     if use_proxy:
         proxy = get_working_proxy()
         if proxy:
@@ -114,108 +167,140 @@ def setup_driver(use_proxy=True):
             "userAgent": random.choice(user_agents)
         })
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
+        if lean:
+            block_resources(driver)
         driver.set_page_load_timeout(30)
+        driver.proxy = proxy
         return driver
     except Exception as e:
         print(f"Failed to create driver: {e}")
         return None
 
+@METRICS.timed('fingerprint')
 def get_image_fingerprint(image_data):
-    try:
-        img = Image.open(io.BytesIO(image_data))
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
-        return str(imagehash.average_hash(img))
-    except:
-        return hashlib.md5(image_data).hexdigest()
+    img_hash = fingerprint_batch([image_data], workers=1)[0]
+    if img_hash == INVALID_HASH:
+        return hashlib.md5(image_data).hexdigest()[:16]
+    return hash_to_hex(img_hash)
 
-def clean_duplicates(save_path, class_name):
+def hash_image_files(file_paths):
+    # Reduced-size decodes fanned out over a process pool for large batches
+    return hex_hashes(file_paths)
+
+def clean_duplicates(save_path, class_name, index=None):
     print("Cleaning existing duplicates...")
     images_dir = os.path.join(save_path, class_name)
     if not os.path.exists(images_dir):
-        return set()
+        return NearDuplicateIndex(NEAR_DUPLICATE_THRESHOLD)
+    
+    own_index = index is None
+    if own_index:
+        index = HashIndex(index_path(save_path, class_name))
     
-    hashes = {}
     duplicates = []
-    unique_hashes = set()
+    unique_hashes = NearDuplicateIndex(NEAR_DUPLICATE_THRESHOLD)
     
-    for file in os.listdir(images_dir):
-        if file.endswith(('.jpg', '.jpeg', '.png')):
-            file_path = os.path.join(images_dir, file)
+    try:
+        hashed, removed = index.sync(images_dir, hash_image_files)
+        print(f"Hash index: {hashed} new or changed files hashed, {removed} removed files dropped")
+        
+        for file, img_hash in index.items():
+            if img_hash is None:
+                continue
+            if img_hash in unique_hashes:
+                duplicates.append(file)
+            else:
+                unique_hashes.add(img_hash, file)
+        
+        for duplicate in duplicates:
             try:
-                with Image.open(file_path) as img:
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    img_hash = str(imagehash.average_hash(img))
-                    
-                    if img_hash in hashes:
-                        duplicates.append(file_path)
-                    else:
-                        hashes[img_hash] = file_path
-                        unique_hashes.add(img_hash)
+                os.remove(os.path.join(images_dir, duplicate))
+                index.remove(duplicate)
+                print(f"Removed duplicate: {duplicate}")
             except Exception as e:
-                print(f"Error processing {file}: {e}")
-    
-    for duplicate in duplicates:
-        try:
-            os.remove(duplicate)
-            print(f"Removed duplicate: {os.path.basename(duplicate)}")
-        except Exception as e:
-            print(f"Error removing {duplicate}: {e}")
+                print(f"Error removing {duplicate}: {e}")
+    finally:
+        if own_index:
+            index.close()
     
     print(f"Removed {len(duplicates)} duplicates, {len(unique_hashes)} unique images remain")
     return unique_hashes
 
+def count_thumbnails(driver):
+    return driver.execute_script("return document.querySelectorAll('img.tile--img__img').length;")
+
+def wait_for_more_thumbnails(driver, previous, timeout=SCROLL_WAIT):
+    # Returns as soon as new tiles render instead of sleeping the full timeout
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.1).until(lambda d: count_thumbnails(d) > previous)
+    except TimeoutException:
+        pass
+    return count_thumbnails(driver)
+
+# One round trip per batch: returns (element, key) for tiles not handed out before and tags them
+# in the page, so later batches only see tiles that scrolled in since
+COLLECT_NEW_TILES_JS = """
+const tiles = [];
+for (const img of document.querySelectorAll('img.tile--img__img:not([data-harvested])')) {
+    const key = img.src || img.getAttribute('data-src');
+    if (!key || key.startsWith('data:')) continue;
+    img.setAttribute('data-harvested', '1');
+    tiles.push([img, key]);
+}
+return tiles;
+"""
+
+def collect_new_tiles(driver):
+    return [(tile, key) for tile, key in driver.execute_script(COLLECT_NEW_TILES_JS)]
+
+@METRICS.timed('load_more_images')
 def load_more_images(driver, min_thumbnails=150):
-    thumbnails = []
+    num_thumbnails = count_thumbnails(driver)
     scroll_count = 0
     max_scrolls = 30  
+    stalled_scrolls = 0
     
-    while len(thumbnails) < min_thumbnails and scroll_count < max_scrolls:
+    while num_thumbnails < min_thumbnails and scroll_count < max_scrolls and stalled_scrolls < 5:
         # Scroll down
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(1)
+        previous = num_thumbnails
+        num_thumbnails = wait_for_more_thumbnails(driver, num_thumbnails)
         
         # Try to click "Show more results" if available
         try:
             show_more = driver.find_element(By.CSS_SELECTOR, "input[type='button'][value='Show more results']")
             driver.execute_script("arguments[0].click();", show_more)
-            time.sleep(2)
+            num_thumbnails = wait_for_more_thumbnails(driver, num_thumbnails, SCROLL_WAIT * 2)
             print("Clicked 'Show more results'")
         except:
             pass
         
-        # Get current thumbnails
-        thumbnails = driver.find_elements(By.CSS_SELECTOR, "img.tile--img__img")
-        print(f"Found {len(thumbnails)} thumbnails after scroll {scroll_count + 1}")
+        print(f"Found {num_thumbnails} thumbnails after scroll {scroll_count + 1}")
         scroll_count += 1
+        # The end of the results: further scrolls only burn the wait timeout
+        stalled_scrolls = stalled_scrolls + 1 if num_thumbnails == previous else 0
         
-    return len(thumbnails)
+    return num_thumbnails
 
 def download_image(url, save_path, index, existing_hashes, query):
     try:
         headers = {'User-Agent': random.choice(user_agents)}
-        response = requests.get(url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            image_data = response.content
-            
+        try:
+            image_data = RATE_CONTROLLER.fetch(url, consume=read_image_body, headers=headers, stream=True)
+        except ImageRejected as e:
+            print(f"\n⚠️ Skipping {e}")
+            return None, False
+        if image_data is not None:
             try:
-                img = Image.open(io.BytesIO(image_data))
-                if img.mode != 'RGB':
-                    print(f"\n⚠️ Skipping non-RGB image (Mode: {img.mode})")
-                    return None, False
-                
-                img = img.convert('RGB')
-                
-                # Get hash after ensuring RGB
                 img_hash = get_image_fingerprint(image_data)
                 
                 if img_hash not in existing_hashes:
-                    img_name = f"{query.replace(' ', '_')}_{index}_{random.randint(1000, 9999)}.jpg"
+                    image_data = transcode_image(image_data)
+                    img_name = f"{query.replace(' ', '_')}_{index}_{random.randint(1000, 9999)}{TRANSCODER.policy.extension}"
                     img_path = os.path.join(save_path, img_name)
                     
-                    # Save the RGB image
-                    img.save(img_path, 'JPEG')
+                    with open(img_path, 'wb') as file:
+                        file.write(image_data)
                     return img_hash, True
             except Exception as e:
                 print(f"\n❌ Error processing image: {e}")
@@ -225,6 +310,28 @@ def download_image(url, save_path, index, existing_hashes, query):
         print(f"Error downloading image: {e}")
     return None, False
 
+@METRICS.timed('thumbnail_fingerprint')
+def fingerprint_thumbnail(thumbnail_src):
+    # Thumbnails are a few KB, so this costs one small request instead of a click and several seconds of waits
+    if not thumbnail_src or not thumbnail_src.startswith('http'):
+        return None
+    try:
+        response = RATE_CONTROLLER.fetch(thumbnail_src, headers={'User-Agent': random.choice(user_agents)})
+        if response.status_code != 200:
+            return None
+        img_hash = fingerprint_batch([response.content], workers=1)[0]
+    except Exception:
+        return None
+    return None if img_hash == INVALID_HASH else hash_to_hex(img_hash)
+
+def known_thumbnail(thumb_hash, existing_hashes, url_index, lock):
+    # Owned if an earlier click showed where this thumbnail leads, or if the thumbnail's own
+    # average hash is already within the near-duplicate threshold of a kept image
+    full_hash = url_index.full_hash(thumb_hash)
+    with lock:
+        return thumb_hash in existing_hashes or (full_hash is not None and full_hash in existing_hashes)
+
+@METRICS.timed('get_full_res_image')
 def get_full_res_image(driver, thumbnail):
     try:
         driver.execute_script("arguments[0].scrollIntoView(true);", thumbnail)
@@ -239,107 +346,210 @@ def get_full_res_image(driver, thumbnail):
     except:
         return None
 
-def scrape_images(query, num_images, save_path, class_name, max_retries=3):
-    existing_hashes = clean_duplicates(save_path, class_name)
-    current_count = len(existing_hashes)
-    images_dir = os.path.join(save_path, class_name)
-    os.makedirs(images_dir, exist_ok=True) 
-    
-    print(f"Currently have {current_count} images, continuing download...")
-    print(f"Saving images to: {images_dir}")
-    
-    stats = {
-        'processed': 0,
-        'skipped_duplicates': 0,
-        'failed_downloads': 0,
-        'successful_downloads': 0,
-        'consecutive_skips': 0
-    }
-    
+@METRICS.timed('transcode')
+def transcode_image(image_data):
+    # Hashing and dedup already ran on the original bytes; only images being kept reach this point
+    image_data, reason = TRANSCODER.prepare(image_data)
+    if reason:
+        METRICS.inc('transcoded')
+    return image_data
+
+@METRICS.timed('file_write')
+def write_new_image(images_dir, class_name, image_number, image_data):
+    # Exclusive create: concurrent terms of the same class may reach the same image number
+    while True:
+        img_name = f"{class_name}_{image_number:04d}_{random.randint(1,999):03d}{TRANSCODER.policy.extension}"
+        img_path = os.path.join(images_dir, img_name)
+        try:
+            with open(img_path, 'xb') as file:
+                file.write(image_data)
+            return img_path
+        except FileExistsError:
+            continue
+
+def read_image_body(response):
+    if response.status_code != 200:
+        return None
+    return read_image_stream(response, IMAGE_POLICY)
+
+@METRICS.timed('download')
+def fetch_image_bytes(img_url):
+    # The body is read inside the rate controller so the host slot and latency sample cover the transfer
+    headers = {'User-Agent': random.choice(user_agents)}
+    return RATE_CONTROLLER.fetch(img_url, consume=read_image_body, headers=headers, stream=True)
+
+def make_download_handler(images_dir, class_name, num_images, existing_hashes, stats, lock, stop_event, index, url_index, journal):
+    def handle(img_url, thumb_hash=None):
+        with lock:
+            if stats['current_count'] >= num_images:
+                return
+
+        if img_url in url_index:
+            if thumb_hash:
+                known = url_index.lookup(img_url)
+                if known and known[0]:
+                    url_index.record_thumbnail(thumb_hash, known[0])
+            with lock:
+                stats['skipped_seen'] += 1
+            METRICS.inc('skipped_seen')
+            journal.log_outcome(img_url, 'seen')
+            return
+
+        try:
+            image_data = fetch_image_bytes(img_url)
+        except ImageRejected as e:
+            with lock:
+                stats['rejected'] += 1
+            METRICS.inc('rejected')
+            url_index.record(img_url, None, 'rejected')
+            journal.log_outcome(img_url, 'rejected')
+            print(f"\n⚠️ Skipping {e}")
+            return
+        if image_data is None:
+            with lock:
+                stats['failed_downloads'] += 1
+            METRICS.inc('failed_downloads')
+            journal.log_outcome(img_url, 'failed')
+            return
+
+        img_hash = get_image_fingerprint(image_data)
+        if thumb_hash:
+            url_index.record_thumbnail(thumb_hash, img_hash)
+
+        with lock:
+            # The index is shared with other crawler processes: dedup and quota are checked there atomically
+            reservation, image_count = index.reserve(img_hash, existing_hashes, num_images)
+            stats['current_count'] = image_count
+            if reservation == 'duplicate':
+                url_index.record(img_url, img_hash, 'duplicate')
+                journal.log_outcome(img_url, 'duplicate')
+                METRICS.inc('skipped_duplicates')
+                stats['skipped_duplicates'] += 1
+                stats['consecutive_skips'] += 1
+                print(f"\n⏭️  Skipped duplicate image")
+                print(f"\nConsecutive skips: {stats['consecutive_skips']}/20")
+                if stats['consecutive_skips'] >= 20:
+                    print("\nReached skip limit, moving to next query...")
+                    stop_event.set()
+                return
+            if reservation == 'full':
+                return
+            image_number = image_count
+
+        try:
+            image_data = transcode_image(image_data)
+            img_path = write_new_image(images_dir, class_name, image_number, image_data)
+        except Exception:
+            index.remove(reservation)
+            raise
+        index.complete(reservation, img_path, img_hash)
+        url_index.record(img_url, img_hash, 'saved')
+        journal.log_outcome(img_url, 'saved')
+        METRICS.inc('images_saved')
+
+        with lock:
+            stats['successful_downloads'] += 1
+            stats['consecutive_skips'] = 0
+            print(f"\n✅ Downloaded new image {image_number}/{num_images}")
+
+    return handle
+
+def harvest_with_api(query, pipeline, stats, done, journal, max_pages=None):
+    # Read at call time so callers (and the benchmark) can change API_MAX_PAGES; None there means no limit
+    max_pages = max_pages or API_MAX_PAGES
+    client = DdgImageClient(base_url=SEARCH_BASE_URL, headers={'User-Agent': random.choice(user_agents)})
+    if journal.cursor:
+        print(f"Resuming API results from {journal.cursor}")
+    try:
+        for img_url in client.iter_image_urls(query, max_pages=max_pages, start_url=journal.cursor, on_page=journal.set_cursor):
+            if done():
+                break
+            stats['processed'] += 1
+            METRICS.inc('urls_harvested')
+            journal.log_resolved(img_url)
+            pipeline.submit(img_url)
+    finally:
+        client.close()
+    print(f"\nAPI backend queued {stats['processed']} image urls, {stats['skipped_seen']} already seen")
+    return True
+
+def harvest_with_browser(query, pipeline, stats, lock, done, journal, max_retries, driver_pool, existing_hashes, url_index):
+    processed_thumbnails = journal.processed_thumbnails()
+    if processed_thumbnails:
+        print(f"Resuming: {len(processed_thumbnails)} thumbnails already handled for this term")
     for attempt in range(max_retries):
-        driver = setup_driver(use_proxy=(attempt > 0))
+        if driver_pool:
+            driver = driver_pool.acquire(use_proxy=(attempt > 0))
+        else:
+            driver = setup_driver(use_proxy=(attempt > 0))
         if not driver:
             continue
-            
+        
+        healthy = True
         try:
-            search_url = f"https://duckduckgo.com/?q={query}&iax=images&ia=images"
+            search_url = f"{SEARCH_BASE_URL}/?q={query}&iax=images&ia=images"
             driver.get(search_url)
-            time.sleep(2)
+            if driver_pool:
+                driver_pool.note_page(driver)
+            wait_for_more_thumbnails(driver, 0, timeout=10)
             
-            consecutive_skips = 0
-            min_thumbnails = 200
+            num_thumbnails = 0
+            empty_batches = 0
             
-            while current_count < num_images:
-                num_thumbnails = load_more_images(driver, min_thumbnails)
-                print(f"\nLoaded batch of {num_thumbnails} thumbnails")
-                
-                thumbnails = driver.find_elements(By.CSS_SELECTOR, "img.tile--img__img")
+            while not done():
+                num_thumbnails = load_more_images(driver, num_thumbnails + THUMBNAIL_BATCH)
+                new_tiles = collect_new_tiles(driver)
+                # Tiles handled in an earlier run of this term still count as page growth
+                tiles = [(tile, key) for tile, key in new_tiles if key not in processed_thumbnails]
+                print(f"\nLoaded {num_thumbnails} thumbnails, {len(tiles)} new")
+                if not new_tiles:
+                    empty_batches += 1
+                    if empty_batches >= 3:
+                        print("\nNo new results after scrolling, term exhausted")
+                        break
+                    continue
+                empty_batches = 0
                 
-                for i, thumbnail in enumerate(thumbnails):
+                for i, (thumbnail, thumbnail_key) in enumerate(tiles):
                     try:
-                        if consecutive_skips >= 10:
-                            print("\nDetected 10 consecutive skips. Scrolling to load fresh content...")
-                            
-                            for _ in range(5):
-                                driver.execute_script(
-                                    "window.scrollTo(0, window.scrollY + window.innerHeight * 2);"
-                                )
-                                time.sleep(1)
-                            consecutive_skips = 0
-                            break  
-                        
+                        if done():
+                            break
+
                         stats['processed'] += 1
-                        print(f"\rProcessing thumbnail {i+1}/{len(thumbnails)}", end="")
+                        print(f"\rProcessing thumbnail {i+1}/{len(tiles)}", end="")
+
+                        thumb_hash = fingerprint_thumbnail(thumbnail_key) if THUMBNAIL_PREDEDUP else None
+                        if thumb_hash and known_thumbnail(thumb_hash, existing_hashes, url_index, lock):
+                            journal.log_thumbnail(thumbnail_key)
+                            processed_thumbnails.add(thumbnail_key)
+                            with lock:
+                                stats['skipped_thumbnails'] += 1
+                            METRICS.inc('skipped_thumbnails')
+                            continue
                         
                         img_url = get_full_res_image(driver, thumbnail)
+                        journal.log_thumbnail(thumbnail_key)
+                        processed_thumbnails.add(thumbnail_key)
                         if not img_url:
-                            stats['failed_downloads'] += 1
+                            with lock:
+                                stats['failed_downloads'] += 1
                             print(f"\n❌ Failed to get URL for thumbnail {i+1}")
                             continue
-                            
-                        # Download and process image
-                        headers = {'User-Agent': random.choice(user_agents)}
-                        response = requests.get(img_url, stream=True, timeout=10)
                         
-                        if response.status_code == 200:
-                            image_data = response.content
-                            img_hash = get_image_fingerprint(image_data)
-                            
-                            if img_hash not in existing_hashes:
-                                img_name = f"{class_name}_{current_count+1:04d}_{random.randint(1,999):03d}.jpg"
-                                img_path = os.path.join(images_dir, img_name)
-                                
-                                with open(img_path, 'wb') as file:
-                                    file.write(image_data)
-                                
-                                existing_hashes.add(img_hash)
-                                current_count += 1
-                                stats['successful_downloads'] += 1
-                                stats['consecutive_skips'] = 0  
-                                print(f"\n✅ Downloaded new image {current_count}/{num_images}")
-                            else:
-                                stats['skipped_duplicates'] += 1
-                                stats['consecutive_skips'] += 1
-                                print(f"\n⏭️  Skipped duplicate image")
-                                print(f"\nConsecutive skips: {stats['consecutive_skips']}/20")
-                                
-                                if stats['consecutive_skips'] >= 20:
-                                    print("\nReached skip limit, moving to next query...")
-                                    return current_count
-                                
-                           
-                            try:
-                                close_button = driver.find_element(By.CSS_SELECTOR, "button.module__close")
-                                close_button.click()
-                                time.sleep(0.5)
-                            except:
-                                pass
-                            
-                            if current_count >= num_images:
-                                break
+                        journal.log_resolved(img_url, thumbnail_key)
+                        METRICS.inc('urls_harvested')
+                        pipeline.submit(img_url, thumb_hash)
+                        
+                        try:
+                            close_button = driver.find_element(By.CSS_SELECTOR, "button.module__close")
+                            close_button.click()
+                            time.sleep(0.5)
+                        except:
+                            pass
                                 
                     except Exception as e:
-                        stats['failed_downloads'] += 1
+                        with lock:
+                            stats['failed_downloads'] += 1
                         print(f"\n❌ Error: {str(e)[:100]}")
                         continue
                 
@@ -348,105 +558,241 @@ def scrape_images(query, num_images, save_path, class_name, max_retries=3):
                 print(f"Downloads: {stats['successful_downloads']}")
                 print(f"Skipped: {stats['skipped_duplicates']}")
                 print(f"Failed: {stats['failed_downloads']}")
+                print(f"Rejected: {stats['rejected']}")
+                print(f"Already seen: {stats['skipped_seen']}")
+                print(f"Known thumbnails: {stats['skipped_thumbnails']}")
+                print(f"Queued: {pipeline.pending()}")
                 
-                if current_count >= num_images:
-                    break
-                
-               
-                if stats['skipped_duplicates'] > 20:
-                    print("\nToo many skipped images, moving to next batch...")
+                if done():
                     break
+            
+            return True
                     
         except Exception as e:
             print(f"Attempt {attempt + 1} failed: {e}")
+            report_proxy_failure(driver)
+            healthy = False
             continue
         finally:
-            if driver:
+            if driver_pool:
+                driver_pool.release(driver, healthy)
+            elif driver:
                 driver.quit()
-        
-        if current_count >= num_images:
-            break
+    
+    return False
+
+def scrape_images(query, num_images, save_path, class_name, max_retries=3, driver_pool=None, backend=SEARCH_BACKEND, resume=True, time_budget=None, stats=None):
+    # time_budget (seconds) ends the run early without finishing the term, so a later call resumes it.
+    # Pass a dict as stats to read the run's counters afterwards
+    args = (query, num_images, save_path, class_name, max_retries, driver_pool, backend, resume, time_budget, stats)
+    with METRICS.span('term'):
+        if query != PROFILE_TERM:
+            return scrape_term(*args)
+        with profile(f"{class_name}_{query.replace(' ', '_')}", os.path.join(METRICS_DIR, 'profiles')):
+            return scrape_term(*args)
+
+def scrape_term(query, num_images, save_path, class_name, max_retries, driver_pool, backend, resume, time_budget=None, stats=None):
+    images_dir = os.path.join(save_path, class_name)
+    os.makedirs(images_dir, exist_ok=True) 
+    journal = CrawlJournal(index_path(save_path, class_name), query)
+    if not resume:
+        journal.reset()
+    elif journal.is_finished():
+        print(f"Term '{query}' already finished in a previous run, skipping")
+        journal.close()
+        if stats is not None:
+            stats.update({'successful_downloads': 0, 'finished': True})
+        index = HashIndex(index_path(save_path, class_name))
+        current_count = len(index.items())
+        index.close()
+        return current_count
+    
+    index = HashIndex(index_path(save_path, class_name))
+    existing_hashes = clean_duplicates(save_path, class_name, index)
+    url_index = UrlIndex(index_path(save_path, class_name))
+    
+    print(f"Currently have {len(existing_hashes)} images, {len(url_index)} known urls, continuing download...")
+    print(f"Saving images to: {images_dir}")
+    
+    stats = {} if stats is None else stats
+    stats.update({
+        'processed': 0,
+        'skipped_duplicates': 0,
+        'failed_downloads': 0,
+        'successful_downloads': 0,
+        'rejected': 0,
+        'skipped_seen': 0,
+        'skipped_thumbnails': 0,
+        'consecutive_skips': 0,
+        'current_count': len(existing_hashes),
+        'finished': False
+    })
+    lock = threading.Lock()
+    deadline = time.time() + time_budget if time_budget else None
+
+    # The harvester only produces full-res urls; download, hashing and writes run on the pipeline workers
+    stop_event = threading.Event()
+    handler = make_download_handler(images_dir, class_name, num_images, existing_hashes, stats, lock, stop_event, index, url_index, journal)
+    pipeline = DownloadPipeline(
+        handler,
+        num_workers=DOWNLOAD_WORKERS,
+        queue_size=DOWNLOAD_QUEUE_SIZE,
+        per_host_limit=PER_HOST_DOWNLOADS,
+        stopped=stop_event
+    )
+
+    def out_of_time():
+        return deadline is not None and time.time() >= deadline
+
+    def done():
+        return pipeline.stopped.is_set() or stats['current_count'] >= num_images or out_of_time()
+
+    journal.set_status('running')
+    completed = False
+    timed_out = False
+    try:
+        # The cursor and thumbnails advance when a url is queued, so urls the last run queued but never handled go first
+        unfinished = journal.unfinished_urls()
+        if unfinished:
+            print(f"Re-queuing {len(unfinished)} urls left unhandled by the previous run")
+        for img_url in unfinished:
+            if done():
+                break
+            pipeline.submit(img_url)
+        if backend == "api":
+            try:
+                completed = harvest_with_api(query, pipeline, stats, done, journal)
+            except (DdgApiError, requests.RequestException) as e:
+                print(f"\nAPI backend failed ({e}), falling back to browser")
+                backend = "selenium"
+        if backend == "selenium":
+            completed = harvest_with_browser(
+                query, pipeline, stats, lock, done, journal, max_retries, driver_pool, existing_hashes, url_index
+            )
+        # Checked before the pipeline drains, so the drain itself can't turn an exhausted term into a timed-out one
+        timed_out = out_of_time() and not pipeline.stopped.is_set()
+    finally:
+        pipeline.close()
+        # A term stopped only by the class quota or its time slice stays resumable; exhausted or saturated terms are done
+        if completed and stats['current_count'] < num_images and not timed_out:
+            journal.set_status('finished')
+            stats['finished'] = True
+        journal.close()
+        index.close()
+        url_index.close()
+
+    return stats['current_count']
+
+WORKER_DRIVER_POOL = None
+
+def init_crawl_worker():
+    # Each crawler process keeps its own warm browser session between jobs
+    global WORKER_DRIVER_POOL
+    WORKER_DRIVER_POOL = DriverPool(
+        setup_driver,
+        size=1,
+        max_pages=MAX_PAGES_PER_SESSION,
+        max_heap_mb=MAX_SESSION_HEAP_MB
+    )
+    # Pool workers leave through multiprocessing's exit path, which runs Finalize hooks but not atexit
+    Finalize(WORKER_DRIVER_POOL, WORKER_DRIVER_POOL.close, exitpriority=10)
+    Finalize(TRANSCODER, TRANSCODER.close, exitpriority=10)
+    metrics_path = os.path.join(METRICS_DIR, f"crawler-{os.getpid()}")
+    METRICS.start_snapshots(metrics_path, METRICS_INTERVAL)
+    Finalize(METRICS, METRICS.write, args=(metrics_path,), exitpriority=10)
+
+def run_term_job(save_path, num_images, class_name, term, time_budget=None):
+    print(f"\nSearching for: {term}")
+    stats = {}
+    start = time.time()
+    count = scrape_images(
+        term, num_images=num_images, save_path=save_path, class_name=class_name,
+        driver_pool=WORKER_DRIVER_POOL, time_budget=time_budget, stats=stats
+    )
+    # What the planner needs to judge the slice
+    return {
+        'count': count,
+        'saved': stats.get('successful_downloads', 0),
+        'elapsed': time.time() - start,
+        'finished': stats.get('finished', False)
+    }
 
-    return current_count
+def remaining_images(save_path, num_images, class_name):
+    index = HashIndex(index_path(save_path, class_name))
+    try:
+        return num_images - index.count()
+    finally:
+        index.close()
 
 if __name__ == "__main__":
     save_path = "dataset/raw"
     batch_terms = {
-#         "Holstein":[
-#             "my beautifull Holstein cow HD",
-# "Holstein cow HD",
-#     "Holstein cow  grazing in open field",
-#     "Close-up of Holstein cow face",
-#     "Black and white Holstein cow standing",
-#     "Holstein cow in dairy farm setting",
-#     "Full body Holstein cow portrait",
-#     "Holstein cow with calf",
-#     "Holstein cow in sunny meadow",
-#     "Holstein cow side view",
-#     "Holstein cow in winter",
-#     "High-resolution Holstein cow image"
-# ]
-
-# "Hereford":[
-#      "my beautifull Hereford cow HD",
-#    "Red Hereford cow with white face grazing",
-# "Close-up of Hereford cow muzzle",
-# "Hereford cow in pasture",
-# "Hereford cow full body shot",
-# "Hereford cow in ranch setting",
-# "Hereford cow standing in field",
-# "Hereford cow with calf",
-# "Hereford cow in sunny day",
-# "Hereford cow side profile",
-# "High-resolution Hereford cow image",
-# ]
-
- "Angus": [
-    "my beautifull Angus cow HD",
-    "Solid black Angus cow grazing hd",
-    "Close-up of Angus cow face",
-    "Angus cow in field",
-    "Full body Angus cow portrait",
-    "Angus cow in beef farm",
-    "Angus cow standing in grassland",
-    "Angus cow with calf",
-    "Angus cow in summer",
-    "Angus cow side view",
-    "High-resolution Angus cow image",
+        "Holstein": [
+            "my beautifull Holstein cow HD",
+            "Holstein cow HD",
+            "Holstein cow  grazing in open field",
+            "Close-up of Holstein cow face",
+            "Black and white Holstein cow standing",
+            "Holstein cow in dairy farm setting",
+            "Full body Holstein cow portrait",
+            "Holstein cow with calf",
+            "Holstein cow in sunny meadow",
+            "Holstein cow side view",
+            "Holstein cow in winter",
+            "High-resolution Holstein cow image"
+        ],
+
+        "Hereford": [
+            "my beautifull Hereford cow HD",
+            "Red Hereford cow with white face grazing",
+            "Close-up of Hereford cow muzzle",
+            "Hereford cow in pasture",
+            "Hereford cow full body shot",
+            "Hereford cow in ranch setting",
+            "Hereford cow standing in field",
+            "Hereford cow with calf",
+            "Hereford cow in sunny day",
+            "Hereford cow side profile",
+            "High-resolution Hereford cow image",
+        ],
+
+        "Angus": [
+            "my beautifull Angus cow HD",
+            "Solid black Angus cow grazing hd",
+            "Close-up of Angus cow face",
+            "Angus cow in field",
+            "Full body Angus cow portrait",
+            "Angus cow in beef farm",
+            "Angus cow standing in grassland",
+            "Angus cow with calf",
+            "Angus cow in summer",
+            "Angus cow side view",
+            "High-resolution Angus cow image",
         ]
-
-      
     }
 
-
-
-     
-    
+    # One quota per class, shared by every term and worker through the class index
     total_images_needed = 1000
-    images_per_term = total_images_needed // len(batch_terms["Angus"])
-    remaining_images = total_images_needed % len(batch_terms["Angus"])
     
-    print(f"Will download approximately {images_per_term} images per search term")
+    print(f"Filling each class to {total_images_needed} images with {CRAWL_WORKERS} crawler processes")
     
-    for class_name, terms in batch_terms.items():
-        current_total = 0
-        
-        for term in terms:
-            print(f"\nSearching for: {term}")
-            
-            try:
-                images_downloaded = scrape_images(term, num_images=1000, save_path=save_path, class_name=class_name)
-                current_total += images_downloaded
-                print(f"Total images so far: {current_total}")
-                
-                # Add delay between terms
-                time.sleep(random.uniform(5, 10))
-                
-            except Exception as e:
-                print(f"Error scraping {term}: {e}")
-                continue
-            
-        print(f"\nFinished with {current_total} total images")
+    # Terms get time slices by measured unique images per minute; saturated ones drop out and
+    # variants of the productive ones are tried once a class runs dry
+    planner = QueryPlanner(batch_terms, slice_seconds=TERM_SLICE_SECONDS)
+    scheduler = CrawlScheduler(
+        batch_terms,
+        functools.partial(remaining_images, save_path, total_images_needed),
+        workers=CRAWL_WORKERS,
+        initializer=init_crawl_worker,
+        planner=planner
+    )
+    scheduler.run(functools.partial(run_term_job, save_path, total_images_needed))
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    with open(os.path.join(METRICS_DIR, 'term_yield.json'), 'w') as f:
+        json.dump(planner.summary(), f, indent=2)
+    
+    for class_name in batch_terms:
+        print(f"\n{class_name}: finished with {total_images_needed - remaining_images(save_path, total_images_needed, class_name)} total images")
 
 
         
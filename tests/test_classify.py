@@ -0,0 +1,83 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'libs'))
+
+from classify import PredictionCache, classify_items, folder_items
+
+LABELS = ['cow', 'goat']
+# Dominant channel -> stand-in probabilities: red reads as cow, blue as goat, green as an unsure goat
+PROBABILITIES = {0: [0.9, 0.1], 2: [0.1, 0.9], 1: [0.45, 0.55]}
+FOLDERS = {'cow': ['red', 'red', 'blue'], 'goat': ['blue', 'green']}
+COLORS = {'red': 0, 'green': 1, 'blue': 2}
+
+
+class StandInModel:
+    """Scores an image by its dominant colour channel and counts how many images it saw."""
+
+    def __init__(self):
+        self.seen = 0
+
+    def predict(self, x):
+        self.seen += len(x)
+        return np.array([PROBABILITIES[int(np.argmax(image.mean(axis=(0, 1))))] for image in x], dtype=np.float32)
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    rng = np.random.default_rng(0)
+    for class_name, colors in FOLDERS.items():
+        os.makedirs(tmp_path / class_name)
+        for i, color in enumerate(colors):
+            # Noise keeps every perceptual hash distinct; the tint decides the stand-in prediction
+            pixels = rng.integers(0, 80, (64, 64, 3), dtype=np.uint8)
+            pixels[..., COLORS[color]] += 150
+            Image.fromarray(pixels).save(tmp_path / class_name / f"img_{i:06d}.jpg", quality=95)
+    return str(tmp_path)
+
+
+def classify(root, model, cache):
+    items = [item for class_name in LABELS for item in folder_items(root, class_name)]
+    records = classify_items(items, model, LABELS, cache=cache, model_id='stand-in', batch_size=2,
+                             threads=2, prepare=lambda images: images)
+    return {(r['class'], r['file']): r for r in records}
+
+
+def test_flags_wrong_class_and_low_confidence(dataset):
+    cache = PredictionCache(os.path.join(dataset, '.index', 'predictions.sqlite'))
+    records = classify(dataset, StandInModel(), cache)
+    cache.close()
+
+    assert [r['predicted'] for r in records.values()] == ['cow', 'cow', 'goat', 'goat', 'goat']
+    assert not records[('cow', 'img_000000.jpg')]['flagged']
+    # Wrong top class
+    assert records[('cow', 'img_000002.jpg')]['flagged']
+    assert records[('cow', 'img_000002.jpg')]['label_probability'] == pytest.approx(0.1)
+    assert not records[('goat', 'img_000000.jpg')]['flagged']
+    # Right class, below MIN_CONFIDENCE
+    assert records[('goat', 'img_000001.jpg')]['flagged']
+    assert records[('goat', 'img_000001.jpg')]['confidence'] == pytest.approx(0.55)
+    assert not any(r['cached'] or r['error'] for r in records.values())
+
+
+def test_second_run_is_served_from_cache(dataset):
+    db_path = os.path.join(dataset, '.index', 'predictions.sqlite')
+    cache = PredictionCache(db_path)
+    first_model = StandInModel()
+    first = classify(dataset, first_model, cache)
+    cache.close()
+    assert first_model.seen == 5
+
+    cache = PredictionCache(db_path)
+    second_model = StandInModel()
+    second = classify(dataset, second_model, cache)
+    cache.close()
+
+    assert second_model.seen == 0
+    assert all(r['cached'] for r in second.values())
+    for key, record in second.items():
+        assert (record['predicted'], record['flagged']) == (first[key]['predicted'], first[key]['flagged'])
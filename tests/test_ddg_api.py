@@ -0,0 +1,73 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path[:0] = [os.path.join(ROOT, 'libs'), os.path.join(ROOT, 'bench')]
+
+import fake_server
+from corpus import SyntheticCorpus
+from ddg_api import DdgApiError, DdgImageClient
+
+CORPUS_SIZE = 250
+PAGE_SIZE = 100
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = fake_server.FakeSearchServer(SyntheticCorpus(CORPUS_SIZE), page_size=PAGE_SIZE).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def client(server):
+    client = DdgImageClient(base_url=server.base_url, timeout=5)
+    yield client
+    client.close()
+
+
+def image_urls(server, start, end):
+    return [f"{server.base_url}/img/{i}.jpg" for i in range(start, end)]
+
+
+def test_parses_vqd(client):
+    assert client.get_vqd('cows') == fake_server.VQD
+
+
+def test_follows_pagination(server, client):
+    assert list(client.iter_image_urls('cows')) == image_urls(server, 0, CORPUS_SIZE)
+
+
+def test_max_pages(server, client):
+    assert list(client.iter_image_urls('cows', max_pages=2)) == image_urls(server, 0, 2 * PAGE_SIZE)
+
+
+def test_resumes_from_cursor(server, client):
+    cursors = []
+    first = list(client.iter_image_urls('cows', max_pages=1, on_page=cursors.append))
+    assert first == image_urls(server, 0, PAGE_SIZE)
+    assert cursors == [f"i.js?q=q&o=json&s={PAGE_SIZE}"]
+
+    rest = list(client.iter_image_urls('cows', start_url=cursors[-1], on_page=cursors.append))
+    assert rest == image_urls(server, PAGE_SIZE, CORPUS_SIZE)
+    assert cursors[-1] is None
+
+
+def test_missing_vqd(client, monkeypatch):
+    monkeypatch.setattr(fake_server, 'RESULTS_PAGE', '<html><body>{query}</body></html>')
+    with pytest.raises(DdgApiError, match='No vqd token'):
+        client.get_vqd('cows')
+
+
+def test_rejected_vqd(client, monkeypatch):
+    monkeypatch.setattr(client, 'get_vqd', lambda query: '4-bad')
+    with pytest.raises(DdgApiError, match='HTTP 403'):
+        list(client.iter_results('cows'))
+
+
+def test_non_json_results(client):
+    # The results page itself is HTML, so resuming from it must fail loudly rather than yield nothing
+    with pytest.raises(DdgApiError, match='not JSON'):
+        list(client.iter_results('cows', start_url='/'))
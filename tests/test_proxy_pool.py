@@ -0,0 +1,131 @@
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'libs'))
+
+from proxy_pool import ProxyPool
+
+TEST_URL = 'http://proxy-check.invalid/'
+
+
+class StandInProxy:
+    """Local HTTP proxy that answers every forwarded request itself after a fixed delay."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.failing = False
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(stand_in.delay)
+                self.send_response(502 if stand_in.failing else 200)
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'ok')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.address = f"127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def proxies():
+    fast, slow = StandInProxy(0.01), StandInProxy(0.2)
+    yield fast, slow
+    fast.close()
+    slow.close()
+
+
+def make_pool(addresses, state_path=None, **kwargs):
+    return ProxyPool(addresses, state_path=state_path, test_urls=[TEST_URL], timeout=2, **kwargs)
+
+
+def test_ranks_by_latency_ewma(proxies):
+    fast, slow = proxies
+    pool = make_pool([slow.address, fast.address])
+    pool.refresh([slow.address, fast.address])
+    assert pool.ranked() == [fast.address, slow.address]
+    assert pool.best() == fast.address
+
+    # The EWMA moves towards the new latency without jumping straight to it
+    before = pool.scores[fast.address]['latency']
+    fast.delay = 0.5
+    assert pool.check(fast.address)
+    after = pool.scores[fast.address]['latency']
+    assert before < after < 0.5
+    assert after == pytest.approx(0.3 * 0.5 + 0.7 * before, abs=0.05)
+
+
+def test_breaker_opens_and_closes(proxies):
+    fast, slow = proxies
+    pool = make_pool([fast.address, slow.address], failure_threshold=2, cooldown=0.5)
+    pool.refresh([fast.address, slow.address])
+
+    fast.failing = True
+    assert not pool.check(fast.address)
+    assert pool.ranked()[0] == fast.address
+    assert not pool.check(fast.address)
+    assert pool.ranked() == [slow.address]
+
+    # Half-open after the cooldown: one failure trips it again, one success closes it
+    time.sleep(0.6)
+    assert fast.address in pool.ranked()
+    assert not pool.check(fast.address)
+    assert pool.ranked() == [slow.address]
+
+    time.sleep(0.6)
+    fast.failing = False
+    assert pool.check(fast.address)
+    assert pool.scores[fast.address]['open_until'] == 0
+    assert pool.ranked()[0] == fast.address
+
+
+def test_scores_persist_across_pools(proxies, tmp_path):
+    fast, slow = proxies
+    state_path = str(tmp_path / 'state' / 'proxy_scores.json')
+    pool = make_pool([fast.address, slow.address], state_path)
+    pool.refresh([fast.address, slow.address])
+    assert os.path.exists(state_path)
+
+    warm = make_pool([fast.address, slow.address, '127.0.0.1:9'], state_path)
+    assert warm.scores[fast.address] == pool.scores[fast.address]
+    assert warm.scores['127.0.0.1:9']['latency'] is None
+    assert warm.ranked() == [fast.address, slow.address]
+
+
+def test_concurrent_saves_never_raise(proxies, tmp_path):
+    fast, _ = proxies
+    state_path = str(tmp_path / 'proxy_scores.json')
+    pool = make_pool([fast.address], state_path)
+    pool.check(fast.address)
+
+    errors = []
+
+    def save_many():
+        try:
+            for _ in range(50):
+                pool.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save_many) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert os.listdir(tmp_path) == ['proxy_scores.json']
+    assert make_pool([fast.address], state_path).scores[fast.address]['successes'] == 1